@@ -13,3 +13,7 @@ def curveprocess():
 def curvematch():
     from pypsucurvetrace.cmatch  import cmatch
     cmatch()
+
+def heatertune():
+    from pypsucurvetrace.htune  import htune
+    htune()
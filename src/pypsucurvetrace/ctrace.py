@@ -15,6 +15,7 @@
 
 import argparse
 import configparser
+import copy
 import datetime
 import numpy as np
 import time
@@ -25,38 +26,79 @@ from pathlib import Path
 
 import pypsucurvetrace.powersupply as powersupply
 import pypsucurvetrace.heaterblock as heaterblock
-from pypsucurvetrace.curvetrace_tools import error_and_exit, say_hello, printit, connect_PSU, configure_test_PSU, configure_idle_PSU, do_idle, start_new_logfile, format_PSU_reading, get_logger
+from pypsucurvetrace.curvetrace_tools import error_and_exit, say_hello, printit, connect_PSU, print_PSU_summary, configure_test_PSU, configure_idle_PSU, do_idle, start_new_logfile, format_PSU_reading, read_PSUs, run_parallel, checkpoint_filename, temperature_filename, sweep_plan_hash, read_checkpoint, write_checkpoint, remove_checkpoint, sort_datafile, truncate_datafile, get_logger
 from pypsucurvetrace.plot_curves import curve_plotter
+from pypsucurvetrace.sweep_steps import voltage_steps, resample_curve, predict_current, plan_sweep
+from pypsucurvetrace.idle_control import thermal_idle_scheduler, steady_state_detector
 
 
 # set up logger:
 logger = get_logger('curvetrace')
 
+# max. time allowed for connecting / turning off the devices (s):
+CONNECT_TIMEOUT = 120.0
+SHUTDOWN_TIMEOUT = 10.0
+
+# max. time between checkpoint writes during curve tracing (s):
+CHECKPOINT_INTERVAL = 5.0
+
 
 if __name__ == "__main__":
     ctrace()
 
 
+def test_current_limit(PSU, V):
+	# current limit of the PSU at test voltage V (based on DUT limits, and adjusted to the power capability of the PSU):
+	if V > 0.0:
+		I = min (PSU.TEST_ILIMIT,PSU.TEST_PLIMIT/V)
+	else:
+		I = PSU.TEST_ILIMIT
+	if (V*I) > PSU.PMAX:
+		I = PSU.PMAX / V
+	return I
+
+
+def turn_off_devices(devices):
+	# turn off the devices that could be set up at startup (if another device failed or timed out), without waiting for unresponsive devices:
+	functions = []
+	for d in devices:
+		if isinstance(d, powersupply.PSU) and d.CONNECTED:
+			functions.append(d.turnOff)
+		elif isinstance(d, heaterblock.heater):
+			functions.append(d.turn_off)
+	for e in run_parallel(functions, timeout=SHUTDOWN_TIMEOUT, return_exceptions=True):
+		if isinstance(e, Exception):
+			logger.warning('Could not turn off device: ' + repr(e))
+	for d in devices:
+		if isinstance(d, heaterblock.heater):
+			try:
+				d.terminate_controller_thread()
+			except Exception as e:
+				logger.warning('Could not terminate heaterblock controller thread: ' + repr(e))
+
+
 def cleanup_exit(PSU1, PSU2, HEATER, queue, plt_proc):
 ###################
 # cleanup at exit #
 ###################
 
 	# Try hard to turn off all PSUs to avoid unwanted/unattended powering of the DUT or heater block.
+	# (turn off all devices concurrently, so that a slow or unresponsive device does not delay turning off the others)
 
+	devices = []
+	functions = []
 	for p in [PSU1, PSU2]:
-		try:
-			if p.CONNECTED:
-				p.turnOff()
-		except:
-			logger.warning('Could not turn off PSU ' + p.LABEL + '!')
-			pass
+		if p.CONNECTED:
+			devices.append('PSU ' + p.LABEL)
+			functions.append(p.turnOff)
+	devices.append('heater')
+	functions.append(HEATER.turn_off)
+
+	r = run_parallel(functions, timeout=SHUTDOWN_TIMEOUT, return_exceptions=True)
+	for d, e in zip(devices, r):
+		if isinstance(e, Exception):
+			logger.warning('Could not turn off ' + d + ': ' + repr(e))
 
-	try:
-		HEATER.turn_off()
-	except Exception as e:
-		logger.warning('Could not turn off heater: ' + repr(e))
-		pass
 	try:
 		HEATER.terminate_controller_thread()
 	except Exception as e:
@@ -80,6 +122,8 @@ def ctrace():
     parser.add_argument('-c', '--config', help='path to configuration file with DUT test parameters')
     parser.add_argument('-b', '--batch', action='store_true', help='batch mode (loop of repeated test tuns)')
     parser.add_argument('-q', '--quick', action='store_true', help='quick mode (pre-heating only, no curve tracing)')
+    parser.add_argument('--parallelread', action='store_true', help='read PSU1 and PSU2 concurrently (PSUs must be connected to separate ports)')
+    parser.add_argument('--resume', action='store_true', help='resume an interrupted curve tracing run (continue the data file after the last completed data point)')
 
     # do not show a "hello" message
     parser.add_argument('--nohello', action='store_true', help='Do not print the hello / about message (useful when the output needs further processing).')
@@ -111,6 +155,18 @@ def ctrace():
 	    logger.info('Running in quick mode (pre-heating only, no curve tracing)...')
 	    quick_mode = True
 
+    # check for concurrent PSU readings:
+    parallel_read = False
+    if args.parallelread:
+	    logger.info('Reading PSU1 and PSU2 concurrently...')
+	    parallel_read = True
+
+    # check for resuming an interrupted run:
+    if args.resume:
+	    if quick_mode:
+		    error_and_exit(logger, 'Cannot resume curve tracing in quick mode (no curve tracing).')
+	    logger.info('Resuming interrupted curve tracing run...')
+
     # read DUT test config file (if any):
     configDUT = []
     if args.config:
@@ -118,21 +174,27 @@ def ctrace():
 	    configDUT = configparser.ConfigParser()
 	    configDUT.read(args.config)
 	    
-    # connect to PSUs:
-    try:
-        PSU1 = connect_PSU(configTESTER, 'PSU1', logger);
-    except Exception as e:
-        error_and_exit(logger, 'Could not connect to PSU1', e)
-    try:
-        PSU2 = connect_PSU(configTESTER, 'PSU2', logger);
-    except Exception as e:
-        error_and_exit(logger, 'Could not connect to PSU1', e)
-
-    # set up heaterblock:
-    HEATER = heaterblock.heater( config=configTESTER, target_temperature=0.0, DUT_PSU1=PSU1, DUT_PSU2=PSU2 )
+    # connect to PSUs and set up heaterblock (concurrently, so that startup takes as long as the slowest device rather than the sum of all devices):
+    # (devices that do not respond within CONNECT_TIMEOUT are abandoned, their daemon threads do not block the exit of the program)
+    PSU1, PSU2, HEATER = run_parallel( [ lambda: connect_PSU(configTESTER, 'PSU1', logger, summary=False),
+                                         lambda: connect_PSU(configTESTER, 'PSU2', logger, summary=False),
+                                         lambda: heaterblock.heater( config=configTESTER, target_temperature=0.0 ) ],
+                                       timeout=CONNECT_TIMEOUT, return_exceptions=True )
+    for p, label in [ (PSU1, 'PSU1') , (PSU2, 'PSU2') , (HEATER, 'heaterblock') ]:
+        if isinstance(p, Exception):
+            # turn off the devices that were set up before giving up:
+            turn_off_devices([PSU1, PSU2, HEATER])
+            if p is HEATER:
+                error_and_exit(logger, 'Could not set up heaterblock', p)
+            error_and_exit(logger, 'Could not connect to ' + label, p)
+    for p in [PSU1, PSU2]:
+        if p.CONNECTED:
+            logger.info('Connected to power supply ' + p.LABEL + ':')
+            print_PSU_summary(p)
+    HEATER.set_DUT_PSUs(PSU1, PSU2)
     HEATER.turn_off()
 
-    logfile, samplename, basename, step = start_new_logfile(logger, batch_mode)
+    logfile, samplename, basename, step = start_new_logfile(logger, batch_mode, resume=args.resume)
 
     # configure voltage values / current and power limits:
     if 'PSU1' in configDUT:
@@ -156,6 +218,39 @@ def ctrace():
     except:
 	    pass
 
+    # set up prediction of the PSU1 current / power limit (optional, may be missing in DUT config file):
+    # (the PSU1 sweep ends at the first step where the current is predicted to exceed the limit and a verification reading confirms the limit)
+    CC_PREDICT = True
+    CC_PREDICT_MARGIN = 0.1
+    try:
+	    CC_PREDICT = int(configDUT['EXTRA']['CC_PREDICT']) > 0
+    except:
+	    pass
+    try:
+	    CC_PREDICT_MARGIN = float(configDUT['EXTRA']['CC_PREDICT_MARGIN'])
+    except:
+	    pass
+
+    # set up order of the voltage steps (optional, may be missing in DUT config file):
+    # (PSU in the outer loop, and serpentine traversal of the inner loop)
+    OUTER_LOOP = 'AUTO'
+    SERPENTINE = False
+    try:
+	    OUTER_LOOP = configDUT['EXTRA']['OUTER_LOOP'].strip().upper()
+    except:
+	    pass
+    if OUTER_LOOP not in [ 'AUTO' , 'PSU1' , 'PSU2' ]:
+	    logger.warning('Unknown OUTER_LOOP ' + OUTER_LOOP + '! Using OUTER_LOOP = AUTO...')
+	    OUTER_LOOP = 'AUTO'
+    try:
+	    u = configDUT['EXTRA']['SERPENTINE'].strip().upper()
+	    if u == 'AUTO':
+		    SERPENTINE = 'AUTO'
+	    else:
+		    SERPENTINE = int(u) > 0
+    except:
+	    pass
+
     # set up temperature control (optional, may be missing in DUT config file):
     TEMP_val = None
     TEMP_tol = None
@@ -205,6 +300,67 @@ def ctrace():
     if T_preheat < 0:
 	    raise ValueError('Pre-heat time must not be negative.')
 
+    # set up detection of steady state during pre-heat (optional, may be missing in DUT config file):
+    # (pre-heat ends once the drift rates of I1, U2 and heaterblock T stay below the thresholds for the hold time)
+    PREHEAT_STEADY = False
+    PREHEAT_WINDOW = 60.0
+    PREHEAT_HOLD = 30.0
+    PREHEAT_DRIFT_I = 0.002
+    PREHEAT_DRIFT_U = 0.005
+    PREHEAT_DRIFT_T = 0.1
+    try:
+	    PREHEAT_STEADY = int(configDUT['EXTRA']['PREHEAT_STEADY']) > 0
+    except:
+	    pass
+    try:
+	    PREHEAT_WINDOW = float(configDUT['EXTRA']['PREHEAT_WINDOW'])
+    except:
+	    pass
+    try:
+	    PREHEAT_HOLD = float(configDUT['EXTRA']['PREHEAT_HOLD'])
+    except:
+	    pass
+    try:
+	    PREHEAT_DRIFT_I = float(configDUT['EXTRA']['PREHEAT_DRIFT_I'])
+    except:
+	    pass
+    try:
+	    PREHEAT_DRIFT_U = float(configDUT['EXTRA']['PREHEAT_DRIFT_U'])
+    except:
+	    pass
+    try:
+	    PREHEAT_DRIFT_T = float(configDUT['EXTRA']['PREHEAT_DRIFT_T'])
+    except:
+	    pass
+
+    # set up idle mode (optional, may be missing in DUT config file):
+    # (FIXED: idle for IDLESECS before each reading, THERMAL: idle only as long as needed to keep the DUT temperature close to the idle temperature, but not longer than IDLESECS)
+    IDLE_MODE = 'FIXED'
+    IDLE_TAU = None
+    IDLE_TOL = 0.1
+    try:
+	    IDLE_MODE = configDUT['EXTRA']['IDLE_MODE'].strip().upper()
+    except:
+	    pass
+    if IDLE_MODE not in [ 'FIXED' , 'THERMAL' ]:
+	    logger.warning('Unknown IDLE_MODE ' + IDLE_MODE + '! Using IDLE_MODE = FIXED...')
+	    IDLE_MODE = 'FIXED'
+    try:
+	    IDLE_TAU = float(configDUT['EXTRA']['IDLE_TAU'])
+    except:
+	    pass
+    try:
+	    IDLE_TOL = float(configDUT['EXTRA']['IDLE_TOL'])
+    except:
+	    pass
+    idle_scheduler = None
+    if ( IDLE_MODE == 'THERMAL' ) and ( T_idle > 0.0 ):
+	    if ( IDLE_TAU is None ) and ( T_preheat == 0.0 ):
+		    logger.warning('IDLE_MODE = THERMAL requires IDLE_TAU or pre-heating (PREHEATSECS > 0) to determine the thermal time constant of the DUT! Using IDLE_MODE = FIXED...')
+		    IDLE_MODE = 'FIXED'
+	    else:
+		    idle_scheduler = thermal_idle_scheduler(tau=IDLE_TAU, tol=IDLE_TOL, t_max=T_idle)
+
     # set up idle conditions (for pre-heat or idle between readings)
     if (T_idle > 0.0) or (T_preheat > 0.0):
 	    if PSU1.CONFIGURED:
@@ -259,6 +415,14 @@ def ctrace():
 				    u = p.TEST_VSTEP
 				    p.TEST_VSTEP = round(p.TEST_VSTEP / p.VRESSET) * p.VRESSET
 				    logger.info('  ' + p.LABEL + ': Voltage step size (' + str(u) + ' V) is not consistent with PSU resolution of voltage setting. Adjusting step size to ' + str(p.TEST_VSTEP) + ' V.')
+			    if p.TEST_VSTEP_MAX is not None:
+				    if p.TEST_VSTEP_MAX <= p.TEST_VSTEP:
+					    logger.info('  ' + p.LABEL + ': Max. voltage step size is not larger than voltage step size. Using fixed step size.')
+					    p.TEST_VSTEP_MAX = None
+				    elif not ( p.TEST_VSTEP_MAX / p.TEST_VSTEP == round(p.TEST_VSTEP_MAX / p.TEST_VSTEP) ):
+					    u = p.TEST_VSTEP_MAX
+					    p.TEST_VSTEP_MAX = round(p.TEST_VSTEP_MAX / p.TEST_VSTEP) * p.TEST_VSTEP
+					    logger.info('  ' + p.LABEL + ': Max. voltage step size (' + str(u) + ' V) is not a multiple of the voltage step size. Adjusting max. step size to ' + str(p.TEST_VSTEP_MAX) + ' V.')
 		    if p.TEST_ILIMIT > p.IMAX:
 			    logger.info('  ' + p.LABEL + ': Adjusting current limit to max. value possible with the power supply (' + str(p.IMAX) + ' A).')
 			    p.TEST_ILIMIT = p.IMAX
@@ -318,7 +482,10 @@ def ctrace():
 		    if p.TEST_VSTEP == 0:
 			    print ('  - voltage output = ' + str(p.TEST_VSTART) + ' V (fixed)')
 		    else:
-			    print ('  - voltage output = ' + str(p.TEST_VSTART) + ' V ... ' + str(p.TEST_VEND) + ' V (' + str(p.TEST_VSTEP) + ' V steps)')
+			    if p.TEST_VSTEP_MAX is None:
+				    print ('  - voltage output = ' + str(p.TEST_VSTART) + ' V ... ' + str(p.TEST_VEND) + ' V (' + str(p.TEST_VSTEP) + ' V steps)')
+			    else:
+				    print ('  - voltage output = ' + str(p.TEST_VSTART) + ' V ... ' + str(p.TEST_VEND) + ' V (adaptive steps, ' + str(p.TEST_VSTEP) + ' V ... ' + str(p.TEST_VSTEP_MAX) + ' V, tolerance = ' + str(p.TEST_VSTEP_TOL) + ' x current limit)')
 		    print ('  - current limit = ' + str(p.TEST_ILIMIT) + ' A')
 		    print ('  - power limit = ' + str(p.TEST_PLIMIT) + ' W')
 		    if p.TEST_POLARITY == 1:
@@ -329,12 +496,19 @@ def ctrace():
     print ('* Repeats per reading = ' + str(N_rep))
     if T_idle == 0.0:
 	    print ('* No idle time between measurements')
-    else:
+    elif idle_scheduler is None:
 	    print ('* Idle time between measurements: ' + str(T_idle) + ' s')
+    else:
+	    u = 'from pre-heat'
+	    if IDLE_TAU is not None:
+		    u = str(IDLE_TAU) + ' s'
+	    print ('* Idle time between measurements: thermal model (time constant = ' + u + ', tolerance = ' + str(IDLE_TOL) + '), max. ' + str(T_idle) + ' s')
     if T_preheat == 0.0:
 	    print ('* No pre-heating before measurements')
     else:
 	    print ('* Pre-heat time before measurements (at idle conditions): ' + str(T_preheat) + ' seconds')
+	    if PREHEAT_STEADY:
+		    print ('* Pre-heat ends at steady state: max. drift of I1 = ' + str(PREHEAT_DRIFT_I) + ' /min, U2 = ' + str(PREHEAT_DRIFT_U) + ' V/min, T = ' + str(PREHEAT_DRIFT_T) + ' K/min (window = ' + str(PREHEAT_WINDOW) + ' s, hold time = ' + str(PREHEAT_HOLD) + ' s)')
     if (T_idle > 0.0) or (T_preheat > 0.0):
 	    for p in [PSU1, PSU2]:
 		    if p.CONNECTED == False:
@@ -347,6 +521,10 @@ def ctrace():
 			    print ('* ' + p.LABEL + ' idle / pre-heat current = ' + str(p.TEST_IIDLE) + ' A')
 			    print ('* ' + p.LABEL + ' max. idle / pre-heat power = ' + str(p.TEST_PIDLELIMIT) + ' W')
 
+    if CC_PREDICT:
+	    print ('* PSU1 current / power limit prediction: on (safety margin = ' + str(CC_PREDICT_MARGIN) + ')')
+    else:
+	    print ('* PSU1 current / power limit prediction: off')
     print ('* Heaterblock temperature (current) = ' + str(HEATER.get_temperature_string()))
     print ('* Heaterblock temperature (target)  = ' + str(HEATER.get_target_temperature_string()))
 
@@ -374,23 +552,228 @@ def ctrace():
     # AVGFUNCTION = 'MEDIAN'
 
     # determine voltage step values:
+    # (fixed or adaptive step size; the step size is adapted to the PSU1 current response for both PSUs)
     V_steps = []
 
     for p in [PSU1,PSU2]:
 	    if not p.CONFIGURED:
-		    V_steps.append( [ 0 ] )
+		    V_steps.append( voltage_steps(0.0, 0.0, 0.0) )
 	    else:
-		    if p.TEST_VSTEP == 0:
-			    # V_steps.append( np.linspace(p.TEST_VSTART,p.TEST_VSTART,1) )
-			    V_steps.append( [ p.TEST_VSTART ] )
-		    else:
-			    if p.TEST_VSTART <= p.TEST_VEND:
-				    u = np.arange( p.TEST_VSTART , p.TEST_VEND+PSU1.TEST_VSTEP ,  p.TEST_VSTEP )
-				    u = [i for i in u if (i >= p.TEST_VSTART) and (i <= p.TEST_VEND) ] # filter out "outliers" that may happen with large VSTEPs
-			    else:
-				    u = np.arange( p.TEST_VSTART , p.TEST_VEND-PSU1.TEST_VSTEP , -p.TEST_VSTEP )
-				    u = [i for i in u if (i >= p.TEST_VEND) and (i <= p.TEST_VSTART) ] # filter out "outliers" that may happen with large VSTEPs
-			    V_steps.append(u)
+		    V_steps.append( voltage_steps(p.TEST_VSTART, p.TEST_VEND, p.TEST_VSTEP, p.TEST_VSTEP_MAX, p.TEST_VSTEP_TOL*PSU1.TEST_ILIMIT, p.VRESSET) )
+
+    # PSU1 voltages to compare the PSU1 current response of the curves at different PSU2 voltages (adaptive PSU2 steps):
+    if PSU1.CONFIGURED:
+	    V1_ref = np.linspace(PSU1.TEST_VSTART, PSU1.TEST_VEND, 21)
+    else:
+	    V1_ref = np.zeros(1)
+
+    # test configuration / sweep plan (the configuration of a resumed run must be the same as for the interrupted run):
+    plan = { 'NREP': N_rep, 'IDLESECS': T_idle, 'PREHEATSECS': T_preheat, 'R2CONTROL': R2CONTROL, 'T_TARGET': TEMP_val, 'T_TOL': TEMP_tol }
+    for p in [PSU1, PSU2]:
+	    if p.CONFIGURED:
+		    plan[p.LABEL] = { 'VSTART': p.TEST_VSTART, 'VEND': p.TEST_VEND, 'VSTEP': p.TEST_VSTEP, 'VSTEP_MAX': p.TEST_VSTEP_MAX, 'VSTEP_TOL': p.TEST_VSTEP_TOL, 'IMAX': p.TEST_ILIMIT, 'PMAX': p.TEST_PLIMIT, 'POLARITY': p.TEST_POLARITY }
+	    else:
+		    plan[p.LABEL] = None
+    plan_hash = sweep_plan_hash(plan)
+
+    # check checkpoint of interrupted run:
+    resume = None
+    if args.resume:
+	    resume = read_checkpoint(samplename)
+	    if resume is None:
+		    error_and_exit(logger, 'Could not read checkpoint file ' + checkpoint_filename(samplename) + '.')
+	    if resume['hash'] != plan_hash:
+		    error_and_exit(logger, 'Test configuration is not the same as for the interrupted run (see ' + checkpoint_filename(samplename) + '). Cannot resume.')
+	    if resume['last'] is None:
+		    logger.info('Interrupted run has no completed data points, starting from the first data point.')
+	    else:
+		    logger.info('Continuing after data point ' + str(resume['N_points']) + ' of the interrupted run.')
+	    # drop data points written after the last checkpoint (these are measured again):
+	    logfile.close()
+	    N_dropped = truncate_datafile(samplename + '.dat', resume['N_points'])
+	    logfile = open(samplename + '.dat', 'a')
+	    if N_dropped > 0:
+		    logger.info('Removed ' + str(N_dropped) + ' data points written after the last checkpoint from the data file.')
+
+    # determine order of the voltage steps:
+    # (the PSU with the longer settle time in the outer loop, from the measured or configured settle times of the PSUs)
+    if ( resume is not None ) and ( 'order' in resume ):
+	    # same order as the interrupted run:
+	    sweep_outer, sweep_serpentine = resume['order']
+    elif V_steps[0].is_adaptive() or V_steps[1].is_adaptive():
+	    if ( OUTER_LOOP == 'PSU1' ) or ( SERPENTINE is True ):
+		    logger.warning('Loop order OUTER_LOOP = ' + OUTER_LOOP + ', SERPENTINE = ' + str(SERPENTINE) + ' requires fixed voltage steps. Using standard loop order.')
+	    sweep_outer, sweep_serpentine = 'PSU2', False
+    else:
+	    settle1 = settle2 = None
+	    if PSU1.CONFIGURED: settle1 = PSU1.settle_time
+	    if PSU2.CONFIGURED: settle2 = PSU2.settle_time
+	    _, sweep_outer, sweep_serpentine = plan_sweep(list(V_steps[0]), list(V_steps[1]), settle1, settle2, OUTER_LOOP, SERPENTINE)
+    sweep_points = None
+    if ( sweep_outer != 'PSU2' ) or sweep_serpentine:
+	    sweep_points, _, _ = plan_sweep(list(V_steps[0]), list(V_steps[1]), outer=sweep_outer, serpentine=sweep_serpentine)
+	    u = 'Loop order: ' + sweep_outer + ' in outer loop'
+	    if sweep_serpentine:
+		    u = u + ', serpentine traversal'
+	    logger.info(u + '.')
+	    if CC_PREDICT:
+		    # prediction of the current / power limit uses the previous curve, which is only available with the standard loop order:
+		    logger.info('PSU1 current / power limit prediction is disabled with this loop order.')
+	    if sweep_serpentine and ( sweep_outer == 'PSU2' ):
+		    logger.warning('Serpentine traversal with PSU2 in the outer loop: curves traced in reverse direction are not cut off at the current / power limit.')
+
+    checkpoint = { 't': None, 'data': None } # time of the last checkpoint write, and checkpoint data not written yet
+
+    def save_checkpoint(last, curve_V1=[], curve_I1=[], force=False):
+	    # save checkpoint with the progress of the curve tracing (to resume the run if it gets interrupted):
+	    # (the checkpoint file is written at most every CHECKPOINT_INTERVAL seconds unless force = True, use flush_checkpoint() to write the latest checkpoint)
+	    VIDLE = [ float(p.TEST_VIDLE) if p.CONFIGURED else None for p in [PSU1, PSU2] ]
+	    checkpoint['data'] = { 'sample': samplename, 'date': str(datetime.datetime.now()), 'hash': plan_hash, 'plan': plan, 'order': [ sweep_outer, sweep_serpentine ], 'last': copy.deepcopy(last), 'N_points': N_points,
+	                           'steps': [ V_steps[0].state(), V_steps[1].state() ], 'curve': { 'V1': [ float(v) for v in curve_V1 ], 'I1': [ float(i) for i in curve_I1 ] }, 'VIDLE': VIDLE }
+	    if force or ( checkpoint['t'] is None ) or ( time.time() - checkpoint['t'] >= CHECKPOINT_INTERVAL ):
+		    flush_checkpoint()
+
+    def flush_checkpoint():
+	    # write the latest checkpoint to the checkpoint file (if not written yet):
+	    if checkpoint['data'] is not None:
+		    write_checkpoint(samplename, checkpoint['data'])
+		    checkpoint['data'] = None
+		    checkpoint['t'] = time.time()
+
+    N_idle = [0, 0.0] # number and total time of idle periods between readings
+
+    def measure_point(V1, I1LIM, V2, I2LIM, limit_predicted=False):
+	    # measure the DUT at voltages V1 and V2 (PSU2 output must be set already), return averaged readings and limiter flags:
+
+	    # init measurement values		
+	    V1MEAS = []
+	    I1MEAS = []
+	    LIMIT1 = 0
+	    V2MEAS = []
+	    I2MEAS = []
+	    LIMIT2 = 0
+	    T_HB   = []
+
+	    # measurement loop:
+	    for i in range(N_rep):
+
+		    # if heaterblock is configured and turned on:
+		    # make sure the heaterblock temperature is within tolerance before doing the measurement,
+		    # allow turning off the DUT to prevent (excessive) heat input from DUT to heaterblock
+		    HEATER.wait_for_stable_T(DUT_PSU_allowed_turn_off=PSU1, terminal_output=True)
+		    
+
+		    # idle (if configured)
+		    t_idle = T_idle
+		    if idle_scheduler is not None:
+		        t_idle = idle_scheduler.idle_time()
+		    if t_idle > 0.0:
+		        P_idle, t_idle = do_idle(PSU1,PSU2,HEATER,t_idle,return_power=idle_scheduler is not None)
+		        N_idle[0] += 1
+		        N_idle[1] += t_idle
+		        if idle_scheduler is not None:
+		            idle_scheduler.idle_done(P_idle, t_idle)
+		        
+		        # return to required PSU2 output:
+		        if PSU2.CONFIGURED:
+		            PSU2.setCurrent(I2LIM,False)
+		            PSU2.setVoltage(V2,True)
+
+		    # set up PSU1 measurement conditions:
+		    if PSU1.CONFIGURED:
+			    PSU1.setCurrent(I1LIM,False) # set current limit at PSU1
+			    PSU1.setVoltage(V1,True) # set voltage at PSU1
+
+		    # read PSU output voltages and currents:
+		    r = read_PSUs([PSU1, PSU2], parallel=parallel_read)
+		    
+		    V1MEAS.append(r[0][0])
+		    I1MEAS.append(r[0][1])
+		    V2MEAS.append(r[1][0])
+		    I2MEAS.append(r[1][1])
+		    if r[0][2] == 'CC':
+			    LIMIT1 = LIMIT1 + 1
+		    if r[1][2] == 'CC':
+			    LIMIT2 = LIMIT2 + 1
+
+		    # DUT power input for the thermal model of the idle scheduler:
+		    if idle_scheduler is not None:
+			    idle_scheduler.update(abs(r[0][0]*r[0][1]) + abs(r[1][0]*r[1][1]))
+
+		    # Determine heaterblock temperature:
+		    T_HB.append(HEATER.get_temperature())
+
+		    # no need for repeated readings if the predicted limit is confirmed:
+		    if limit_predicted and r[0][2] == 'CC':
+			    break
+
+	    # Determine median or mean of repeated readings:
+	    if AVGFUNCTION == 'MEDIAN':
+		    V1MEAS = np.median(V1MEAS)
+		    I1MEAS = np.median(I1MEAS)
+		    V2MEAS = np.median(V2MEAS)
+		    I2MEAS = np.median(I2MEAS)
+		    try:
+			    T_HB   = np.median(T_HB)
+		    except:
+			    T_HB = None
+			    pass
+	    else:
+		    V1MEAS = np.mean(V1MEAS)
+		    I1MEAS = np.mean(I1MEAS)
+		    V2MEAS = np.mean(V2MEAS)
+		    I2MEAS = np.mean(I2MEAS)
+		    try:
+			    T_HB   = np.mean(T_HB)
+		    except:
+			    T_HB = None
+			    pass
+		    
+	    # Check current limits (some PSUs are not very careful with this):
+	    if I1MEAS > I1LIM:
+		    LIMIT1 = 1
+	    if I2MEAS > I2LIM:
+		    LIMIT2 = 1
+
+	    # Parse limiter flags:
+	    if LIMIT1 > 0:
+		    LIMIT1 = 1
+	    else:
+		    LIMIT1 = 0
+	    if LIMIT2 > 0:
+		    LIMIT2 = 1
+	    else:
+		    LIMIT2 = 0
+
+	    return V1MEAS, I1MEAS, LIMIT1, V2MEAS, I2MEAS, LIMIT2, T_HB
+
+
+    def output_point(V1, I1LIM, V2, I2LIM, V1MEAS, I1MEAS, LIMIT1, V2MEAS, I2MEAS, LIMIT2, T_HB):
+	    # output data of one measurement point:
+
+	    # send data to curve plotter thread:
+	    u = [ V1*PSU1.TEST_POLARITY, I1LIM*PSU1.TEST_POLARITY, V1MEAS*PSU1.TEST_POLARITY, I1MEAS*PSU1.TEST_POLARITY, LIMIT1, V2*PSU2.TEST_POLARITY, I2LIM*PSU2.TEST_POLARITY, V2MEAS*PSU2.TEST_POLARITY, I2MEAS*PSU2.TEST_POLARITY, LIMIT2, T_HB ]
+	    queue.put(u)
+	    
+	    # Print results to terminal:
+	    try:
+		    T_HB = "{:.2f}".format(T_HB)
+	    except:
+		    T_HB = "NA"
+		    pass
+	    
+	    t =  format_PSU_reading(V1*PSU1.TEST_POLARITY, PSU1.VRESSET)      + ' ' + \
+	         format_PSU_reading(I1LIM*PSU1.TEST_POLARITY, PSU1.IRESSET)   + ' ' + \
+	         format_PSU_reading(V1MEAS*PSU1.TEST_POLARITY, PSU1.VRESREAD) + ' ' + \
+	         format_PSU_reading(I1MEAS*PSU1.TEST_POLARITY, PSU1.IRESREAD) + ' ' + \
+	         "{:1d}".format(LIMIT1)				          + ' ' + \
+	         format_PSU_reading(V2*PSU2.TEST_POLARITY, PSU2.VRESSET)      + ' ' + \
+	         format_PSU_reading(I2LIM*PSU2.TEST_POLARITY, PSU2.IRESSET)   + ' ' + \
+	         format_PSU_reading(V2MEAS*PSU2.TEST_POLARITY, PSU2.VRESREAD) + ' ' + \
+	         format_PSU_reading(I2MEAS*PSU2.TEST_POLARITY, PSU2.IRESREAD) + ' ' + \
+	         "{:1d}".format(LIMIT2)                                       + ' ' + \
+	         T_HB
+	    printit(t, logfile )
 
     try:
 
@@ -399,6 +782,19 @@ def ctrace():
 	    if PSU1.CONFIGURED: Uc_ini_1 = PSU1.TEST_VIDLE
 	    if PSU2.CONFIGURED: Uc_ini_2 = PSU2.TEST_VIDLE
 
+	    if resume is not None:
+		    # restore idle voltages as regulated during the interrupted run:
+		    if PSU1.CONFIGURED: PSU1.TEST_VIDLE = resume['VIDLE'][0]
+		    if PSU2.CONFIGURED: PSU2.TEST_VIDLE = resume['VIDLE'][1]
+
+		    # show data of the interrupted run in the plot:
+		    try:
+			    for u in np.atleast_2d(np.genfromtxt(samplename + '.dat', comments='%')):
+				    if len(u) > 0:
+					    queue.put(list(u))
+		    except Exception as e:
+			    logger.warning('Could not read data of the interrupted run: ' + repr(e))
+
 	    # run the test/measurements (loop until done):
 	    do_run = True
 	    while do_run:
@@ -406,9 +802,14 @@ def ctrace():
 		    # Ask if okay to start the test
 		    input ('\nReady for testing of ' + samplename + '? Press ENTER to start testing or CTRL+C to abort...')
 
+		    # write heaterblock temperature readings to file (to correlate temperature excursions with the curve data):
+		    HEATER.set_history_file(temperature_filename(samplename), append=resume is not None)
+
 		    # Print header / column labels:
 		    printit('* Sample: ' + samplename,logfile,'%', terminal_output=False)
 		    printit('* Date / time: ' + str(datetime.datetime.now()),logfile,'%', terminal_output=False)
+		    if resume is not None:
+			    printit('* Resuming interrupted run after data point ' + str(resume['N_points']),logfile,'%', terminal_output=False)
 		    printit (R2CTL_txt,logfile,'%', terminal_output=False)
 		    if quick_mode:
 			    printit ('* Running in quick mode (pre-heating only, no curve tracing)',logfile,'%', terminal_output=False)
@@ -451,182 +852,269 @@ def ctrace():
 			    else:
 				    do_TEMP_wait = False
 			    
+			    # monitor the pre-heat readings (estimation of the thermal time constant of the DUT, detection of steady state):
+			    monitors = []
+			    if ( idle_scheduler is not None ) and ( IDLE_TAU is None ):
+				    monitors.append(idle_scheduler.observe)
+			    steady = None
+			    if PREHEAT_STEADY:
+				    steady = steady_state_detector(PREHEAT_WINDOW, PREHEAT_HOLD, PREHEAT_DRIFT_I, PREHEAT_DRIFT_U, PREHEAT_DRIFT_T)
+				    monitors.append(steady.observe)
+			    monitor = None
+			    if len(monitors) > 0:
+				    monitor = lambda *r: any([ m(*r) for m in monitors ])
+
 			    # do idle/preheat:
-			    do_idle(PSU1, PSU2, HEATER, T_preheat, file=logfile, wait_for_TEMP=do_TEMP_wait)
+			    P_idle, t_preheat = do_idle(PSU1, PSU2, HEATER, T_preheat, file=logfile, wait_for_TEMP=do_TEMP_wait, monitor=monitor, return_power=idle_scheduler is not None)
+			    if ( steady is not None ) and ( t_preheat < T_preheat ):
+				    logger.info('DUT operating point reached steady state, pre-heat ended after ' + "{:.1f}".format(t_preheat) + ' s.')
+			    for p in [PSU1, PSU2]:
+				    if p.CONFIGURED and ( getattr(p, 'TEST_IDLE_REGULATOR', None) is not None ):
+					    gm = p.TEST_IDLE_REGULATOR.gm()
+					    if gm is None:
+						    u = 'Idle bias regulation (' + p.LABEL + '): transconductance unknown'
+					    else:
+						    u = 'Idle bias regulation (' + p.LABEL + '): transconductance = ' + "{:.4g}".format(gm) + ' A/V'
+					    if not p.TEST_IDLE_REGULATOR.converged():
+						    u = u + ', idle current not within tolerance at end of pre-heat'
+					    logger.info(u + '.')
+
+			    if idle_scheduler is not None:
+				    if idle_scheduler.tau() is None:
+					    if idle_scheduler.estimate_tau() is None:
+						    logger.warning('Could not determine the thermal time constant of the DUT from the pre-heat readings! Using fixed idle time between readings...')
+						    idle_scheduler = None
+					    else:
+						    logger.info('Thermal time constant of the DUT (from pre-heat): ' + "{:.1f}".format(idle_scheduler.tau()) + ' s')
+				    if idle_scheduler is not None:
+					    idle_scheduler.idle_done(P_idle, t_preheat)
 
 		    if not quick_mode:
 			    logger.info('Curve tracing started...')
+			    t_start = time.time() # start time of curve tracing
+			    N_points = 0 # number of data points
+			    for p in [PSU1, PSU2]:
+				    if p.CONNECTED:
+					    p.settle_stats(reset=True)
+
+			    # PSU1 voltage and current data of the previous curve (for prediction of the current / power limit):
+			    prev_V1 = prev_I1 = None
+			    N_predict = [0, 0] # number of predicted limits (confirmed, not confirmed by the verification reading)
+			    N_idle[0] = N_idle[1] = 0
+
+			    if ( sweep_outer == 'PSU2' ) and ( not sweep_serpentine ):
+			    # standard order: one curve after the other (PSU2 in outer loop, PSU1 in inner loop)
+
+				    # determine PSU2 voltage steps (continue after the last completed step if resuming an interrupted run):
+				    last = None
+				    if resume is not None:
+					    last = resume['last']
+				    if last is None:
+					    i2_start = 0
+					    V2_steps = iter(V_steps[1])
+					    save_checkpoint(None, force=True)
+				    else:
+					    N_points = resume['N_points']
+					    i2_start = last['i2'] + int(last['V2_done'])
+					    V2_steps = V_steps[1].resume(resume['steps'][1], last['V2'], repeat=not last['V2_done'])
+
+				    for i2, V2 in enumerate(V2_steps, start=i2_start):
+				    # outer loop (V2)
 
-			    for V2 in V_steps[1]:
-			    # outer loop (V2)
-
-				    # get rid of numerical imprecisions (truncate values to voltage resolution of PSU):
-				    # V2 = round(V2/PSU2.VRESSET) * PSU2.VRESSET
-
-				    limit = 0 # number of CC events at a given step
-				    limit_max = 2 # max. number of CC events before breaking from the loop
-
+					    # get rid of numerical imprecisions (truncate values to voltage resolution of PSU):
+					    # V2 = round(V2/PSU2.VRESSET) * PSU2.VRESSET
+
+					    limit = 0 # number of CC events at a given step
+					    limit_max = 2 # max. number of CC events before breaking from the loop
+
+					    # PSU1 voltage and current data of the curve (for adaptive PSU2 steps):
+					    curve_V1 = []
+					    curve_I1 = []
+					    curve_limited = False # flag indicating that the curve ended in current / power limit
+
+					    # determine PSU1 voltage steps (continue after the last completed step if resuming an interrupted run):
+					    if ( last is not None ) and ( not last['V2_done'] ):
+						    limit = last['limit']
+						    curve_V1 = resume['curve']['V1']
+						    curve_I1 = resume['curve']['I1']
+						    i1_start = last['i1'] + 1
+						    V1_steps = V_steps[0].resume(resume['steps'][0], last['V1'])
+					    else:
+						    i1_start = 0
+						    V1_steps = iter(V_steps[0])
+					    last = resume = None
 
-				    if PSU2.CONFIGURED:
 
-					    # Determine PSU2 current limit (based on DUT limits):
-					    if V2 > 0.0:
-						    I2LIM = min (PSU2.TEST_ILIMIT,PSU2.TEST_PLIMIT/V2)
-					    else:
-						    I2LIM = PSU2.TEST_ILIMIT
+					    # Determine PSU2 current limit:
+					    I2LIM = test_current_limit(PSU2, V2)
 
-					    # Check if current limit is within power capability of PSU2 (and adjust if necessary):
-					    if (V2*I2LIM) > PSU2.PMAX:
-						    I2LIM = PSU2.PMAX / V2
-					    
-					    # set PSU2 voltage + current:
-					    PSU2.setCurrent(I2LIM,False)
-					    PSU2.setVoltage(V2,True)
+					    if PSU2.CONFIGURED:
+						    # set PSU2 voltage + current:
+						    PSU2.setCurrent(I2LIM,False)
+						    PSU2.setVoltage(V2,True)
 
-				    for V1 in V_steps[0]:
-				    # inner loop (V1)
+					    for i1, V1 in enumerate(V1_steps, start=i1_start):
+					    # inner loop (V1)
 
-					    # get rid of numerical imprecisions (truncate values to voltage resolution of PSU):
-					    # V1 = round(V1/PSU1.VRESSET) * PSU1.VRESSET
-
-					    # init measurement values		
-					    V1MEAS = []
-					    I1MEAS = []
-					    LIMIT1 = 0
-					    V2MEAS = []
-					    I2MEAS = []
-					    LIMIT2 = 0
-					    T_HB   = []
-
-					    # measurement loop:
-					    for i in range(N_rep):
-
-						    # if heaterblock is configured and turned on:
-						    # make sure the heaterblock temperature is within tolerance before doing the measurement,
-						    # allow turning off the DUT to prevent (excessive) heat input from DUT to heaterblock
-						    HEATER.wait_for_stable_T(DUT_PSU_allowed_turn_off=PSU1, terminal_output=True)
-						    
-
-						    # idle (if configured)
-						    if T_idle > 0.0:
-						        do_idle(PSU1,PSU2,HEATER,T_idle)
-						        
-						        # return to required PSU2 output:
-						        if PSU2.CONFIGURED:
-						            PSU2.setCurrent(I2LIM,False)
-						            PSU2.setVoltage(V2,True)
+						    # get rid of numerical imprecisions (truncate values to voltage resolution of PSU):
+						    # V1 = round(V1/PSU1.VRESSET) * PSU1.VRESSET
 
 						    # Determine PSU1 current limit:
-						    if V1 > 0.0:
-							    I1LIM = min (PSU1.TEST_ILIMIT,PSU1.TEST_PLIMIT/V1)
+						    I1LIM = test_current_limit(PSU1, V1)
+
+						    # predict if PSU1 will run into the current / power limit at this step:
+						    # (if so, a single verification reading is taken, and the sweep ends here if the limit is confirmed)
+						    limit_predicted = False
+						    if CC_PREDICT and PSU1.CONFIGURED:
+							    I1_pred = predict_current(V1, curve_V1, curve_I1, prev_V1, prev_I1)
+							    if I1_pred is not None:
+								    limit_predicted = I1_pred > (1.0+CC_PREDICT_MARGIN)*I1LIM
+
+						    # measure the DUT:
+						    V1MEAS, I1MEAS, LIMIT1, V2MEAS, I2MEAS, LIMIT2, T_HB = measure_point(V1, I1LIM, V2, I2LIM, limit_predicted)
+
+						    # Check if current / power limit has been reached:
+						    if (LIMIT1 == 0) and (LIMIT2 == 0):
+							    limit = 0 # reset counter
 						    else:
-							    I1LIM = PSU1.TEST_ILIMIT
-
-						    # Check if current limit is within power capability of PSU1 (and adjust if necessary):
-						    if (V1*I1LIM) > PSU1.PMAX:
-							    I1LIM = PSU1.PMAX / V1
-
-						    # set up PSU1 measurement conditions:
-						    if PSU1.CONFIGURED:
-							    PSU1.setCurrent(I1LIM,False) # set current limit at PSU1
-							    PSU1.setVoltage(V1,True) # set voltage at PSU1
-
-						    # read PSU output voltages and currents:
-						    r = []
-						    for p in [PSU1, PSU2]:
-							    if p.CONFIGURED:
-								    r.append(p.read(p.NSTABLEREADINGS))
-							    else:
-								    r.append([0.0,0.0,'NONE'])
-						    
-						    V1MEAS.append(r[0][0])
-						    I1MEAS.append(r[0][1])
-						    V2MEAS.append(r[1][0])
-						    I2MEAS.append(r[1][1])
-						    if r[0][2] == 'CC':
-							    LIMIT1 = LIMIT1 + 1
-						    if r[1][2] == 'CC':
-							    LIMIT2 = LIMIT2 + 1
-
-						    # Determine heaterblock temperature:
-						    T_HB.append(HEATER.get_temperature())
-
-					    # Determine median or mean of repeated readings:
-					    if AVGFUNCTION == 'MEDIAN':
-						    V1MEAS = np.median(V1MEAS)
-						    I1MEAS = np.median(I1MEAS)
-						    V2MEAS = np.median(V2MEAS)
-						    I2MEAS = np.median(I2MEAS)
-						    try:
-							    T_HB   = np.median(T_HB)
-						    except:
-							    T_HB = None
-							    pass
+							    limit = limit + 1
+							    if limit >= limit_max:
+								    curve_limited = True
+								    break # break out of the inner loop (V1 steps) and continue with the next V2 step
+
+						    # add PSU1 current to the curve data (for adaptive steps):
+						    V_steps[0].add(V1, I1MEAS)
+						    curve_V1.append(V1)
+						    curve_I1.append(I1MEAS)
+
+						    # send data to curve plotter thread, print results to terminal and data file:
+						    output_point(V1, I1LIM, V2, I2LIM, V1MEAS, I1MEAS, LIMIT1, V2MEAS, I2MEAS, LIMIT2, T_HB)
+						    N_points += 1
+
+						    # save progress:
+						    save_checkpoint({ 'i2': i2, 'V2': float(V2), 'i1': i1, 'V1': float(V1), 'V2_done': False, 'limit': limit }, curve_V1, curve_I1)
+
+						    # end the sweep if the predicted current / power limit is confirmed:
+						    if limit_predicted:
+							    if LIMIT1 > 0:
+								    N_predict[0] += 1
+								    curve_limited = True
+								    break # break out of the inner loop (V1 steps) and continue with the next V2 step
+							    N_predict[1] += 1
+
+					    # add PSU1 current response of the curve (for adaptive PSU2 steps):
+					    V_steps[1].add(V2, resample_curve(curve_V1, curve_I1, V1_ref))
+					    # keep the curve for prediction of the current / power limit on the next curve (without the last point if it is in current / power limit):
+					    if curve_limited:
+						    prev_V1 = curve_V1[:-1]
+						    prev_I1 = curve_I1[:-1]
 					    else:
-						    V1MEAS = np.mean(V1MEAS)
-						    I1MEAS = np.mean(I1MEAS)
-						    V2MEAS = np.mean(V2MEAS)
-						    I2MEAS = np.mean(I2MEAS)
-						    try:
-							    T_HB   = np.mean(T_HB)
-						    except:
-							    T_HB = None
-							    pass
-						    
-					    # Check current limits (some PSUs are not very careful with this):
-					    if I1MEAS > I1LIM:
-						    LIMIT1 = 1
-					    if I2MEAS > I2LIM:
-						    LIMIT2 = 1
-
-					    # Parse limiter flags:
-					    if LIMIT1 > 0:
-						    LIMIT1 = 1
-					    else:
-						    LIMIT1 = 0
-					    if LIMIT2 > 0:
-						    LIMIT2 = 1
-					    else:
-						    LIMIT2 = 0
+						    prev_V1 = curve_V1
+						    prev_I1 = curve_I1
+
+					    # save progress:
+					    save_checkpoint({ 'i2': i2, 'V2': float(V2), 'i1': None, 'V1': None, 'V2_done': True, 'limit': 0 }, force=True)
+
+			    else:
+			    # planned order of the (V2, V1) points (fixed voltage steps only)
+
+				    V1_grid = list(V_steps[0])
+				    V2_grid = list(V_steps[1])
+
+				    # limiter events of the curves (the rest of a curve is skipped after limit_max consecutive limiter events, like with the standard order):
+				    limit_max = 2
+				    limit = [0] * len(V2_grid) # number of consecutive limiter events of each curve
+				    curve_done = [False] * len(V2_grid)
+
+				    # continue after the last completed point if resuming an interrupted run:
+				    last = None
+				    if resume is not None:
+					    last = resume['last']
+				    if last is None:
+					    k_start = 0
+					    save_checkpoint(None, force=True)
+				    else:
+					    N_points = resume['N_points']
+					    k_start = last['k'] + 1
+					    limit = last['limit']
+					    curve_done = last['done']
+				    resume = None
+
+				    V2_set = None
+				    for k in range(k_start, len(sweep_points)):
+
+					    i2, i1 = sweep_points[k]
+					    if curve_done[i2]:
+						    continue # skip the rest of a curve in current / power limit
+					    V1 = V1_grid[i1]
+					    V2 = V2_grid[i2]
+
+					    # Determine PSU1 and PSU2 current limits:
+					    I1LIM = test_current_limit(PSU1, V1)
+					    I2LIM = test_current_limit(PSU2, V2)
+
+					    # set PSU2 voltage + current (if changed):
+					    if PSU2.CONFIGURED and ( V2 != V2_set ):
+						    PSU2.setCurrent(I2LIM,False)
+						    PSU2.setVoltage(V2,True)
+						    V2_set = V2
+
+					    # measure the DUT:
+					    V1MEAS, I1MEAS, LIMIT1, V2MEAS, I2MEAS, LIMIT2, T_HB = measure_point(V1, I1LIM, V2, I2LIM)
 
 					    # Check if current / power limit has been reached:
+					    # (curves traced in reverse direction with serpentine traversal start in the limit, and are not cut off)
 					    if (LIMIT1 == 0) and (LIMIT2 == 0):
-						    limit = 0 # reset counter
+						    limit[i2] = 0 # reset counter
 					    else:
-						    limit = limit + 1
-						    if limit >= limit_max:
-							    break # break out of the inner loop (V1 steps) and continue with the next V2 step
-
-					    # send data to curve plotter thread:
-					    u = [ V1*PSU1.TEST_POLARITY, I1LIM*PSU1.TEST_POLARITY, V1MEAS*PSU1.TEST_POLARITY, I1MEAS*PSU1.TEST_POLARITY, LIMIT1, V2*PSU2.TEST_POLARITY, I2LIM*PSU2.TEST_POLARITY, V2MEAS*PSU2.TEST_POLARITY, I2MEAS*PSU2.TEST_POLARITY, LIMIT2, T_HB ]
-					    queue.put(u)
-					    
-					    # Print results to terminal:
-					    try:
-						    T_HB = "{:.2f}".format(T_HB)
-					    except:
-						    T_HB = "NA"
-						    pass
-					    
-					    t =  format_PSU_reading(V1*PSU1.TEST_POLARITY, PSU1.VRESSET)      + ' ' + \
-					         format_PSU_reading(I1LIM*PSU1.TEST_POLARITY, PSU1.IRESSET)   + ' ' + \
-					         format_PSU_reading(V1MEAS*PSU1.TEST_POLARITY, PSU1.VRESREAD) + ' ' + \
-					         format_PSU_reading(I1MEAS*PSU1.TEST_POLARITY, PSU1.IRESREAD) + ' ' + \
-					         "{:1d}".format(LIMIT1)				          + ' ' + \
-					         format_PSU_reading(V2*PSU2.TEST_POLARITY, PSU2.VRESSET)      + ' ' + \
-					         format_PSU_reading(I2LIM*PSU2.TEST_POLARITY, PSU2.IRESSET)   + ' ' + \
-					         format_PSU_reading(V2MEAS*PSU2.TEST_POLARITY, PSU2.VRESREAD) + ' ' + \
-					         format_PSU_reading(I2MEAS*PSU2.TEST_POLARITY, PSU2.IRESREAD) + ' ' + \
-					         "{:1d}".format(LIMIT2)                                       + ' ' + \
-					         T_HB
-					    printit(t, logfile )
-
-			    logger.info('Curve tracing completed.')
+						    limit[i2] = limit[i2] + 1
+						    if ( limit[i2] >= limit_max ) and not ( sweep_serpentine and ( sweep_outer == 'PSU2' ) and ( i2 % 2 == 1 ) ):
+							    curve_done[i2] = True
+							    save_checkpoint({ 'k': k, 'limit': limit, 'done': curve_done }, force=True)
+							    continue # skip this point and the rest of the curve
+
+					    # send data to curve plotter thread, print results to terminal and data file:
+					    output_point(V1, I1LIM, V2, I2LIM, V1MEAS, I1MEAS, LIMIT1, V2MEAS, I2MEAS, LIMIT2, T_HB)
+					    N_points += 1
+
+					    # save progress:
+					    save_checkpoint({ 'k': k, 'limit': limit, 'done': curve_done })
+
+				    # write the data in the standard order (one curve after the other) for further processing of the data file:
+				    # (the data file is closed while it is replaced by the sorted file, and is then reopened for further output)
+				    logfile.close()
+				    sort_datafile(samplename + '.dat', PSU1, PSU2)
+				    logfile = open(samplename + '.dat', 'a')
+
+			    t_trace = time.time() - t_start
+			    logger.info('Curve tracing completed (' + str(N_points) + ' data points in ' + "{:.1f}".format(t_trace) + ' s, ' + "{:.3f}".format(N_points/max(t_trace, 1E-9)) + ' points/s).')
+			    for p in [PSU1, PSU2]:
+				    if p.CONNECTED:
+					    N, t_settle, t_max, N_read = p.settle_stats()
+					    if N > 0:
+						    logger.info('  ' + p.LABEL + ' settle time (' + p.SETTLEMODE.lower() + '): ' + str(N) + ' voltage steps, ' + "{:.1f}".format(t_settle) + ' s total, ' + "{:.0f}".format(1000*t_settle/N) + ' ms mean, ' + "{:.0f}".format(1000*t_max) + ' ms max, ' + "{:.1f}".format(N_read/N) + ' readings per step.')
+
+			    if T_idle > 0.0:
+				    logger.info('  Idle time: ' + str(N_idle[0]) + ' idle periods, ' + "{:.1f}".format(N_idle[1]) + ' s total.')
+
+			    s = HEATER.get_controller_stats()
+			    if ( s is not None ) and ( s['N'] > 0 ):
+				    logger.info('  Heaterblock PID loop: ' + str(s['N']) + ' iterations at ' + str(s['interval']) + ' s interval, jitter ' + "{:.0f}".format(1000*s['jitter_mean']) + ' ms mean, ' + "{:.0f}".format(1000*s['jitter_max']) + ' ms max, ' + str(s['N_late']) + ' late, ' + str(s['N_write']) + ' heater PSU writes, CPU use ' + "{:.1f}".format(100*s['cpu']) + '%.')
+
+			    if sum(N_predict) > 0:
+				    logger.info('  PSU1 current / power limit predicted at ' + str(sum(N_predict)) + ' steps (' + str(N_predict[0]) + ' confirmed, ' + str(N_predict[1]) + ' not confirmed by verification reading).')
+
+			    # curve tracing is complete, no need to resume:
+			    checkpoint['data'] = None
+			    remove_checkpoint(samplename)
 			    
 		    # Turn off PSUs:
 		    for p in [PSU1, PSU2]:
 			    if p.CONNECTED:
 				    p.turnOff()
+
+		    # stop writing heaterblock temperature readings to file:
+		    HEATER.set_history_file(None)
 	    
 		    if batch_mode:
 		    
@@ -636,6 +1124,9 @@ def ctrace():
 			    # reset initial values for idle conditions:
 			    if PSU1.CONFIGURED: PSU1.TEST_VIDLE = Uc_ini_1
 			    if PSU2.CONFIGURED: PSU2.TEST_VIDLE = Uc_ini_2
+			    for p in [PSU1, PSU2]:
+				    if p.CONFIGURED and hasattr(p, 'TEST_IDLE_REGULATOR'):
+					    p.TEST_IDLE_REGULATOR = None # new DUT, new transconductance estimate
 			    
 			    # tell curve plotter to start new set of curves:
 			    queue.put([])
@@ -650,4 +1141,9 @@ def ctrace():
 	    logger.warning('Oooops, something went wrong during testing: ' + repr(e))
 
     finally:
+	    # write the latest progress of an interrupted run:
+	    if checkpoint['data'] is not None:
+		    flush_checkpoint()
+	    if Path(checkpoint_filename(samplename)).is_file():
+		    logger.info('Progress of the interrupted curve tracing run is saved in ' + checkpoint_filename(samplename) + '. Use the --resume option to continue the run.')
 	    cleanup_exit(PSU1, PSU2, HEATER, queue, plt_proc)
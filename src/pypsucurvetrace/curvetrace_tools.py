@@ -7,8 +7,13 @@ import sys
 import time
 import math
 import os.path
+import json
+import hashlib
 import logging
+import threading
+import queue
 import numpy as np
+from concurrent.futures import Future, wait
 
 
 #############
@@ -86,7 +91,7 @@ def format_PSU_reading(value, resolution):
 # start a new file for logging data output #
 ############################################
 
-def start_new_logfile(logger, do_batch=False, basename=None, step=None):
+def start_new_logfile(logger, do_batch=False, basename=None, step=None, resume=False):
 
 	samplename = None
 
@@ -118,8 +123,16 @@ def start_new_logfile(logger, do_batch=False, basename=None, step=None):
 		# name of data file:
 		logfilename = samplename + '.dat'
 		
+		if resume:
+			# check if data file and checkpoint of an interrupted curve tracing run exist:
+			if not ( os.path.exists(logfilename) and os.path.exists(checkpoint_filename(samplename)) ):
+				print('No interrupted curve tracing run found for ' + samplename + '! Please try a different name...')
+				samplename = None
+				basename = None
+				step = None
+
 		# check if data file exists:
-		if os.path.exists(logfilename):
+		elif os.path.exists(logfilename):
 			u = 'Data / log file ' + logfilename + ' exists!'
 			if do_batch:
 				input (u + ' Try moving the file out of the way, then press ENTER...')
@@ -128,8 +141,11 @@ def start_new_logfile(logger, do_batch=False, basename=None, step=None):
 			samplename = None
 			basename = None
 
-	# start logfile:
-	logfile = open(logfilename,'w')
+	# start logfile (or continue logfile of an interrupted run):
+	if resume:
+		logfile = open(logfilename,'a')
+	else:
+		logfile = open(logfilename,'w')
 	if logfile:
 	    logger.info('Logging output to ' + logfilename + '...')
 	else:
@@ -138,6 +154,64 @@ def start_new_logfile(logger, do_batch=False, basename=None, step=None):
 	return logfile, samplename, basename, step
 
 
+#########################################################
+# sort data file in the standard order of curve tracing #
+#########################################################
+
+def sort_datafile(filename, PSU1, PSU2):
+	# sort the data lines of a data file in the standard order of curve tracing (one curve after the other, i.e. by PSU2 voltage
+	# setting, then by PSU1 voltage setting, both in the direction of the voltage steps). Comment lines are kept at the beginning of the file.
+
+	with open(filename, 'r') as f:
+		lines = f.read().splitlines()
+
+	comments = [ l for l in lines if l.startswith('%') or l.strip() == '' ]
+	data = [ l for l in lines if not ( l.startswith('%') or l.strip() == '' ) ]
+
+	def key(l):
+		u = l.split()
+		k = []
+		for col, p in [ (5, PSU2) , (0, PSU1) ]:
+			d = p.TEST_POLARITY
+			if p.TEST_VEND < p.TEST_VSTART:
+				d = -d
+			k.append( d*float(u[col]) )
+		return k
+
+	data.sort(key=key)
+
+	with open(filename + '.tmp', 'w') as f:
+		for l in comments + data:
+			print(l, file=f)
+	os.replace(filename + '.tmp', filename)
+
+
+def truncate_datafile(filename, N):
+	# keep only the first N data lines of a data file (e.g. to drop data points of an interrupted run that were written after the last checkpoint).
+	# Comment lines are kept. Returns the number of data lines removed.
+
+	with open(filename, 'r') as f:
+		lines = f.read().splitlines()
+
+	out = []
+	n = 0
+	for l in lines:
+		if l.startswith('%') or l.strip() == '':
+			out.append(l)
+		else:
+			n += 1
+			if n <= N:
+				out.append(l)
+
+	if n > N:
+		with open(filename + '.tmp', 'w') as f:
+			for l in out:
+				print(l, file=f)
+		os.replace(filename + '.tmp', filename)
+
+	return max(0, n-N)
+
+
 #############################################################
 # function to print output both to console and to data file #
 #############################################################
@@ -165,7 +239,7 @@ def __convert_str_tuple(x):
 # connect to power supply #
 ###########################
 
-def connect_PSU(configTESTER, label, logger):
+def connect_PSU(configTESTER, label, logger, summary=True):
 
 	import pypsucurvetrace.powersupply as powersupply
 
@@ -230,9 +304,19 @@ def connect_PSU(configTESTER, label, logger):
 			I_READ_CALPOLY = (0, 1)
 			pass
 
+		# concurrent commands to stacked PSU units (optional):
+		parallel = True
+		if 'PARALLEL_UNITS' in configTESTER[label]:
+			parallel = bool(int(configTESTER[label]['PARALLEL_UNITS']))
+
+		# baud rate of serial port (optional):
+		baud = None
+		if 'BAUD' in configTESTER[label]:
+			baud = eval(configTESTER[label]['BAUD'])
+
 		# connect to PSU(s):
 		logger.info ('Connecting to power supply ' + label + '...')
-		P = powersupply.PSU(port, commandset, label, V_SET_CALPOLY, V_READ_CALPOLY, I_SET_CALPOLY, I_READ_CALPOLY)
+		P = powersupply.PSU(port, commandset, label, V_SET_CALPOLY, V_READ_CALPOLY, I_SET_CALPOLY, I_READ_CALPOLY, parallel, baud)
 
 		# set number of consistent readings for measurements (optional):
 		if 'NUMSTABLEREAD' in configTESTER[label]:
@@ -240,6 +324,28 @@ def connect_PSU(configTESTER, label, logger):
 		else:
 			logger.warning ('Number of consistent measurement readings not configured! Using N = 1...')
 			P.NSTABLEREADINGS = 1
+
+		# PSU timing profile (optional):
+		if P.CONNECTED and ( 'CALIBRATE_TIMING' in configTESTER[label] ):
+			calibrate = int(configTESTER[label]['CALIBRATE_TIMING'])
+			if calibrate > 0:
+				__timing_profile(P, port, calibrate > 1, logger)
+
+		# settle time of a 1 V step (optional, overrides the value from the timing profile):
+		if 'SETTLETIME' in configTESTER[label]:
+			P.SETTLETIME = float(configTESTER[label]['SETTLETIME'])
+
+		# setpoint cache (optional):
+		if 'SETPOINT_CACHE' in configTESTER[label]:
+			P.SETPOINT_CACHE = bool(int(configTESTER[label]['SETPOINT_CACHE']))
+
+		# method to wait for stable output after changing the voltage setpoint (optional):
+		if 'SETTLEMODE' in configTESTER[label]:
+			mode = configTESTER[label]['SETTLEMODE'].strip().upper()
+			if mode in [ 'PREDICTIVE' , 'FIXED' ]:
+				P.SETTLEMODE = mode
+			else:
+				logger.warning ('Unknown SETTLEMODE ' + mode + '! Using SETTLEMODE = ' + P.SETTLEMODE + '...')
 			
 		if P.CONNECTED:
 
@@ -247,27 +353,86 @@ def connect_PSU(configTESTER, label, logger):
 			P.turnOff()
 
 			# show summary
-			for k in range(len(P._PSU)):
-				if len(P._PSU) > 1:
-					print ('* Command set (unit '+str(k+1)+'): ' + P._PSU[k].COMMANDSET)
-					print ('* Model (unit '+str(k+1)+'): ' + P._PSU[k].MODEL)
-				else:
-					print ('* Command set: ' + P._PSU[k].COMMANDSET)
-					print ('* Model: ' + P._PSU[k].MODEL)
-			print ('* Min. voltage: ' + str(P.VMIN) + ' V')
-			print ('* Max. voltage: ' + str(P.VMAX) + ' V')
-			print ('* Max. current: ' + str(P.IMAX) + ' A')
-			print ('* Max. power: ' + str(P.PMAX) + ' W')
-			print ('* Voltage setting resolution: ' + str(P.VRESSET) + ' V')
-			print ('* Current setting resolution: ' + str(P.IRESSET) + ' A')
-			print ('* Voltage reading resolution: ' + str(P.VRESREAD) + ' V')
-			print ('* Current reading resolution: ' + str(P.IRESREAD) + ' A')
-			print ('* Number of consistent readings for measurements: ' + str(P.NSTABLEREADINGS))
+			if summary:
+				print_PSU_summary(P)
 
 	return P
 
 
 
+def print_PSU_summary(P):
+	# print summary of PSU properties:
+	if P.CONNECTED:
+		for k in range(len(P._PSU)):
+			if len(P._PSU) > 1:
+				print ('* Command set (unit '+str(k+1)+'): ' + P._PSU[k].COMMANDSET)
+				print ('* Model (unit '+str(k+1)+'): ' + P._PSU[k].MODEL)
+			else:
+				print ('* Command set: ' + P._PSU[k].COMMANDSET)
+				print ('* Model: ' + P._PSU[k].MODEL)
+		print ('* Min. voltage: ' + str(P.VMIN) + ' V')
+		print ('* Max. voltage: ' + str(P.VMAX) + ' V')
+		print ('* Max. current: ' + str(P.IMAX) + ' A')
+		print ('* Max. power: ' + str(P.PMAX) + ' W')
+		print ('* Voltage setting resolution: ' + str(P.VRESSET) + ' V')
+		print ('* Current setting resolution: ' + str(P.IRESSET) + ' A')
+		print ('* Voltage reading resolution: ' + str(P.VRESREAD) + ' V')
+		print ('* Current reading resolution: ' + str(P.IRESREAD) + ' A')
+		print ('* Number of consistent readings for measurements: ' + str(P.NSTABLEREADINGS))
+		print ('* Max. settle time: ' + str(P.MAXSETTLETIME) + ' s')
+		print ('* Read idle time: ' + str(P.READIDLETIME) + ' s')
+		if P.SETTLETIME is not None:
+			print ('* Settle time (1 V step): ' + str(P.SETTLETIME) + ' s')
+
+
+# only one user prompt at a time (PSUs are connected concurrently):
+_prompt_lock = threading.Lock()
+
+
+def __timing_profile(P, port, recalibrate, logger):
+	# apply timing profile of the PSU (READIDLETIME, SETTLETIME) from the profile cache, or characterize the PSU if there is no cached profile:
+
+	cachefile = 'PSU_timing_profiles.json'
+
+	# profile key: command set, model and serial number (or port, if the PSU does not report its serial number):
+	key = []
+	for k in range(len(P._PSU)):
+		u = P._PSU[k]
+		if getattr(u, 'SERIALNUMBER', None):
+			key.append(u.COMMANDSET + ':' + u.MODEL + ':SN=' + str(u.SERIALNUMBER))
+		else:
+			if type(port) is tuple:
+				key.append(u.COMMANDSET + ':' + u.MODEL + ':' + str(port[k]))
+			else:
+				key.append(u.COMMANDSET + ':' + u.MODEL + ':' + str(port))
+	key = ' + '.join(key)
+
+	profiles = read_cache(cachefile)
+
+	if ( key in profiles ) and not recalibrate:
+		logger.info (P.LABEL + ': using cached timing profile from ' + profiles[key]['DATE'] + '.')
+		profile = profiles[key]
+
+	else:
+		# the PSU output is turned on for the characterization, ask for confirmation first (one prompt at a time if several PSUs are connected concurrently):
+		with _prompt_lock:
+			u = input(P.LABEL + ': characterizing PSU timing, the PSU output will be turned on at low voltage and current. Make sure no DUT is connected to ' + P.LABEL + ', then press ENTER (or enter N to skip): ')
+		if u.strip().upper() in [ 'N' , 'NO' ]:
+			logger.info (P.LABEL + ': skipped characterization of PSU timing, using default timing.')
+			return
+		logger.info (P.LABEL + ': characterizing PSU timing...')
+		try:
+			profile = P.calibrate_timing()
+		except RuntimeError as e:
+			logger.warning (P.LABEL + ': could not characterize PSU timing, using default timing (' + str(e) + ').')
+			return
+		profile['DATE'] = time.strftime('%Y-%m-%d %H:%M:%S')
+		update_cache(cachefile, key, profile)
+		logger.info (P.LABEL + ': round-trip time = ' + '{:.1f}'.format(1000*profile['T_READ']) + ' ms, settle time = ' + '{:.1f}'.format(1000*profile['T_SETTLE']) + ' ms, voltage noise = ' + '{:.2g}'.format(profile['V_NOISE']) + ' V, current noise = ' + '{:.2g}'.format(profile['I_NOISE']) + ' A.')
+
+	P.apply_timing(profile)
+
+
 ###############################
 # configure PSU test settings #
 ###############################
@@ -301,6 +466,14 @@ def configure_test_PSU(PSU, logger, configDUT = []):
 			else:
 				PSU.TEST_VSTEP      = __get_number('* ' + PSU.LABEL + ' voltage step size (V): ',allowZero=False,allowNegative=False,typ='float')
 
+		# adaptive voltage steps (optional):
+		PSU.TEST_VSTEP_MAX = None
+		PSU.TEST_VSTEP_TOL = 0.01
+		if 'VSTEP_MAX' in configDUT:
+			PSU.TEST_VSTEP_MAX = float(configDUT['VSTEP_MAX'])
+		if 'VSTEP_TOL' in configDUT:
+			PSU.TEST_VSTEP_TOL = float(configDUT['VSTEP_TOL'])
+
 		if 'IMAX' in configDUT:
 			PSU.TEST_ILIMIT = float(configDUT['IMAX'])
 		else:
@@ -384,6 +557,8 @@ def configure_idle_PSU(PSU,configDUT):
 			PSU.TEST_IIDLE = __get_number('* ' + PSU.LABEL + ' idle current (A): ',allowZero=True,allowNegative=False,typ='float')
 
 
+		PSU.TEST_IDLE_REGULATOR = None # idle bias regulator (set up by do_idle)
+
 	return PSU
 
 
@@ -391,7 +566,25 @@ def configure_idle_PSU(PSU,configDUT):
 # do idle / DUT break-in #
 ##########################
 
-def do_idle(PSU1, PSU2, HEATER, seconds, file=None, wait_for_TEMP=False):
+def do_idle(PSU1, PSU2, HEATER, seconds, file=None, wait_for_TEMP=False, monitor=None, return_power=False):
+	'''
+	P, t = do_idle(PSU1, PSU2, HEATER, seconds, file=None, wait_for_TEMP=False, monitor=None, return_power=False)
+
+	Set the PSUs to the idle / pre-heat conditions of the DUT, and wait (regulate the idle bias if configured).
+
+	INPUT:
+	PSU1, PSU2: PSU objects
+	HEATER: heaterblock object
+	seconds: idle / pre-heat time (s)
+	file (optional): data file to write the operating point at the end of the idle / pre-heat period
+	wait_for_TEMP (optional): wait for stable heaterblock temperature (the waiting time is not included in the idle time)
+	monitor (optional): function monitor(t, U1, I1, U2, I2, T) that is called with each reading taken during the idle / pre-heat period (PSU1 and PSU2 values). If the monitor returns True, the idle / pre-heat period ends early.
+	return_power (optional): determine the DUT power at the end of the idle / pre-heat period (needs extra PSU readings if the idle bias is not regulated)
+
+	OUTPUT:
+	P: DUT power at the end of the idle / pre-heat period (W, None if not determined)
+	t: duration of the idle / pre-heat period (s)
+	'''
 	
 	REG = None
 
@@ -409,15 +602,50 @@ def do_idle(PSU1, PSU2, HEATER, seconds, file=None, wait_for_TEMP=False):
 			if p.CONFIGURED:
 				p.setCurrent(p.TEST_IIDLE,False)
 				p.setVoltage(p.TEST_VIDLE,False) # don't check for stable voltage, since current limiter may upset the the voltage value
-		# wait pre-heat time:
-		time.sleep(seconds)
+		t0 = time.time()
+		if monitor is None:
+			# wait pre-heat time:
+			time.sleep(seconds)
+		else:
+			# wait pre-heat time, with readings for the monitor:
+			while time.time() < t0+seconds:
+				time.sleep( min( 0.5 , max( t0+seconds-time.time() , 0.0 ) ) )
+				r = [ p.read() if p.CONFIGURED else [0.0, 0.0, 'NONE'] for p in [PSU1, PSU2] ]
+				if monitor(time.time()-t0, r[0][0], r[0][1], r[1][0], r[1][1], HEATER.get_temperature(do_read=False)):
+					break
+		t_idle = time.time()-t0
+
+		# DUT power at the end of the idle period (only read the PSUs if the result is needed):
+		P = None
+		write_file = ( file is not None ) and PSU1.CONFIGURED and PSU2.CONFIGURED
+		if return_power or write_file:
+			r = [ p.read() if p.CONFIGURED else [0.0, 0.0, 'NONE'] for p in [PSU1, PSU2] ]
+			P = abs(r[0][0]*r[0][1]) + abs(r[1][0]*r[1][1])
+
+		# write idle / preheat conditions to file:
+		if write_file:
+			t = '* OPERATING POINT AT END OF PREHEAT / IDLE: ' + \
+			    "U1 = " + format_PSU_reading(PSU1.TEST_POLARITY*r[0][0], PSU1.VRESREAD) + " V" + '  ' + \
+			    "I1 = " + format_PSU_reading(PSU1.TEST_POLARITY*r[0][1], PSU1.IRESREAD) + " A" + '  ' + \
+			    "U2 = " + format_PSU_reading(PSU2.TEST_POLARITY*r[1][0], PSU2.VRESREAD) + " V" + '  ' + \
+			    "I2 = " + format_PSU_reading(PSU2.TEST_POLARITY*r[1][1], PSU2.IRESREAD) + " A" + '  ' + \
+			    "T = " + HEATER.get_temperature_string(do_read=False) + " °C" + '  ' + \
+			    "t = " + "{:.1f}".format(t_idle) + " s"
+			printit(t, file , '%')
 
 	else: # fixed output on FIX power supply and regulated output on REG power supply
 
 		IFIXLIM = min (FIX.TEST_ILIMIT,FIX.TEST_PIDLELIMIT/FIX.TEST_VIDLE); # current limit set at fixed PSU
 		
-		# sleep time (seconds):
-		dt = 0.0
+		# idle bias regulator (keeps the transconductance estimate from one idle period to the next):
+		if REG.TEST_IDLE_REGULATOR is None:
+			from pypsucurvetrace.idle_control import idle_bias_regulator # (not at top of module to avoid circular import)
+			REG.TEST_IDLE_REGULATOR = idle_bias_regulator(REG.TEST_IDLE_GM, REG.TEST_VIDLE_MIN, REG.TEST_VIDLE_MAX, REG.VRESSET)
+		regulator = REG.TEST_IDLE_REGULATOR
+		regulator.reset()
+
+		# tolerance of the idle current (1% of the target value, but not less than the reading resolution):
+		I_tol = max( 0.01*abs(FIX.TEST_IIDLE) , 2*FIX.IRESREAD )
 		
 		# Set output limits at the fixed PSU:
 		FIX.setCurrent(IFIXLIM,False)
@@ -458,28 +686,35 @@ def do_idle(PSU1, PSU2, HEATER, seconds, file=None, wait_for_TEMP=False):
 			    "T = " + T_HB + " °C"
 			print (t, end="\r")
 
+			if monitor is not None:
+				if FIX is PSU1:
+					u = [Uf, If, Ur, Ir]
+				else:
+					u = [Ur, Ir, Uf, If]
+				if monitor(time.time()-t0-heater_delays, *u, HEATER.get_temperature(do_read=False)):
+					break
+
 			if f[2] == "CC":
 				If = IFIXLIM * (1+(FIX.TEST_VIDLE-Uf)/FIX.TEST_VIDLE)
 
-			dIf = If-FIX.TEST_IIDLE  # deviation of the observed idle current from the target value
-			if not dIf == 0.0:
-				# determine the voltage changed needed for Ur voltage:
-				dUr = 0.65 * dIf / REG.TEST_IDLE_GM
-				
-				if REG.TEST_VIDLE - dUr < REG.TEST_VIDLE_MIN:
-					REG.TEST_VIDLE = REG.TEST_VIDLE_MIN
-				elif REG.TEST_VIDLE - dUr > REG.TEST_VIDLE_MAX:
-					REG.TEST_VIDLE = REG.TEST_VIDLE_MIN
-				else:
-					REG.TEST_VIDLE = REG.TEST_VIDLE - dUr
+			# determine the voltage setpoint at the regulating PSU from the deviation of the observed idle current from the target value:
+			U = regulator.update(REG.TEST_VIDLE, If, FIX.TEST_IIDLE, I_tol)
+			if not U == REG.TEST_VIDLE:
+				REG.TEST_VIDLE = U
 				REG.setVoltage(REG.TEST_VIDLE,True)
 
-			time.sleep(dt)
+			# wait for next reading (rate limited, slower after convergence):
+			time.sleep( min( regulator.interval() , max( t0+seconds+heater_delays-time.time() , 0.0 ) ) )
 			timenow = time.time()
 
+		t_idle = time.time()-t0-heater_delays
+
 		# Clear the terminal:
 		print (' '*len(t), end="\r")
 
+		# DUT power at the end of the idle period:
+		P = abs(Uf*If) + abs(Ur*Ir)
+
 		# write idle / preheat conditions to file:
 		if file is not None:
 			t = '* OPERATING POINT AT END OF PREHEAT / IDLE: ' + \
@@ -487,9 +722,246 @@ def do_idle(PSU1, PSU2, HEATER, seconds, file=None, wait_for_TEMP=False):
 			    "I1 = " + format_PSU_reading(FIX.TEST_POLARITY*If, FIX.IRESREAD) + " A" + '  ' + \
 			    "U2 = " + format_PSU_reading(REG.TEST_POLARITY*Ur, REG.VRESREAD) + " V" + '  ' + \
 			    "I2 = " + format_PSU_reading(REG.TEST_POLARITY*Ir, REG.IRESREAD) + " A" + '  ' + \
-			    "T = " + T_HB + " °C"
+			    "T = " + T_HB + " °C" + '  ' + \
+			    "t = " + "{:.1f}".format(t_idle) + " s"
 			printit(t, file , '%')
 
+	return P, t_idle
+
+
+################################################
+# run functions concurrently in worker threads #
+################################################
+
+def _run_future(future, function):
+	# run function and set its result (or exception) in future:
+	if not future.set_running_or_notify_cancel():
+		return
+	try:
+		future.set_result(function())
+	except BaseException as e:
+		future.set_exception(e)
+
+
+def _run_in_daemon_thread(function):
+	# run function in a new daemon thread (does not block the exit of the program if the function hangs), return Future with the result:
+	future = Future()
+	threading.Thread(target=_run_future, args=(future, function), daemon=True).start()
+	return future
+
+
+class worker_thread:
+	"""
+	Persistent worker thread that runs the submitted functions one after the other (e.g. the transactions on one serial port).
+	The thread is a daemon thread, so a function that hangs (e.g. waiting for an unresponsive device) does not block the exit of the program.
+	"""
+
+	def __init__(self, name=None):
+		self._queue = queue.SimpleQueue()
+		self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+		self._thread.start()
+
+
+	def submit(self, function):
+		# run function in the worker thread, return Future with the result:
+		future = Future()
+		self._queue.put( (future, function) )
+		return future
+
+
+	def _run(self):
+		while True:
+			future, function = self._queue.get()
+			_run_future(future, function)
+
+
+
+def run_parallel(functions, timeout=None, return_exceptions=False, executors=None):
+	'''
+	results = run_parallel(functions, timeout=None, return_exceptions=False, executors=None)
+
+	Run functions concurrently in worker threads and wait for them to finish. All functions are waited for (or until the timeout) before an
+	exception is raised, so no function is still running (e.g. in the middle of a transaction on a serial port) while the caller handles the exception.
+
+	INPUT:
+	functions: list of functions (without arguments, use lambda or functools.partial to pass arguments)
+	timeout (optional): max. time to wait for all functions to finish (s). Functions that are still running after the timeout are abandoned.
+	return_exceptions (optional): if True, exceptions raised by the functions (or TimeoutError) are returned in the results list instead of being raised
+	executors (optional): list of executors (e.g. one persistent worker_thread per serial port), function k is run by executors[k].
+	                      By default, each function runs in a new daemon thread, which does not block the exit of the program if the function hangs.
+
+	OUTPUT:
+	results: list of return values of the functions (same order as functions)
+	'''
+
+	if executors is None:
+		futures = [ _run_in_daemon_thread(f) for f in functions ]
+	else:
+		futures = [ e.submit(f) for e, f in zip(executors, functions) ]
+
+	_, not_done = wait(futures, timeout=timeout)
+
+	results = []
+	error = None # first exception (in the order of the functions)
+	for f in futures:
+		if f in not_done:
+			r = TimeoutError('Function did not finish within ' + str(timeout) + ' s.')
+		elif f.exception() is not None:
+			r = f.exception()
+		else:
+			results.append(f.result())
+			continue
+		if error is None:
+			error = r
+		results.append(r)
+
+	if ( error is not None ) and not return_exceptions:
+		raise error
+
+	return results
+
+
+#############################
+# read PSU1 and PSU2 values #
+#############################
+
+def read_PSUs(PSUs, parallel=False):
+	'''
+	r = read_PSUs(PSUs, parallel=False)
+
+	Read voltage, current and limiter mode from the configured PSUs (using the number of consistent readings configured for each PSU).
+
+	INPUT:
+	PSUs: list of PSU objects
+	parallel (optional): if True, read the PSUs concurrently in separate threads. If a PSU fails, the reading of the other PSU is completed
+	                     before the exception is raised (so the caller's error handling, e.g. turning off the PSUs, does not collide with a reading in progress).
+
+	OUTPUT:
+	r: list of readings (V, I, L) of the PSUs, [0.0, 0.0, 'NONE'] for PSUs that are not configured
+	'''
+
+	functions = []
+	for p in PSUs:
+		if p.CONFIGURED:
+			functions.append( lambda p=p: p.read(p.NSTABLEREADINGS) )
+		else:
+			functions.append( lambda: [0.0, 0.0, 'NONE'] )
+
+	if parallel:
+		r = run_parallel(functions) # (waits for all readings before raising an exception)
+	else:
+		r = [ f() for f in functions ]
+
+	return r
+
+
+#########################################################
+# read / write data cache files in the user config dir #
+#########################################################
+
+def user_config_dir():
+	# directory for user specific data that is reused across runs (cached PSU profiles etc.):
+	d = os.environ.get('XDG_CONFIG_HOME')
+	if not d:
+		d = os.path.join(os.path.expanduser('~'), '.config')
+	return os.path.join(d, 'pypsucurvetrace')
+
+
+def read_cache(name):
+	# read cache file (JSON dictionary) from the user config dir, return empty dict if file does not exist or is not readable:
+	f = os.path.join(user_config_dir(), name)
+	try:
+		with open(f, 'r') as fp:
+			data = json.load(fp)
+		if not isinstance(data, dict):
+			raise ValueError('Unexpected data format in ' + f)
+	except FileNotFoundError:
+		data = {}
+	except Exception as e:
+		get_logger('curvetrace_tools').warning('Could not read cache file ' + f + ', ignoring it (' + repr(e) + ').')
+		data = {}
+	return data
+
+
+def write_cache(name, data):
+	# write cache file (JSON dictionary) to the user config dir (replaces existing file in one go, so concurrent readers never see half-written files):
+	d = user_config_dir()
+	f = os.path.join(d, name)
+	try:
+		os.makedirs(d, exist_ok=True)
+		with open(f + '.tmp', 'w') as fp:
+			json.dump(data, fp, indent=1, sort_keys=True)
+		os.replace(f + '.tmp', f)
+	except Exception as e:
+		get_logger('curvetrace_tools').warning('Could not write cache file ' + f + ' (' + repr(e) + ').')
+
+
+_cache_lock = threading.Lock()
+
+def update_cache(name, key, value):
+	# set a single entry of a cache file in the user config dir (safe for use by concurrent threads):
+	with _cache_lock:
+		data = read_cache(name)
+		if data.get(key) != value:
+			data[key] = value
+			write_cache(name, data)
+
+
+################################################################
+# read / write checkpoint file of an interrupted curve tracing #
+################################################################
+
+def checkpoint_filename(samplename):
+	# name of the checkpoint file that goes with the data file of a sample:
+	return samplename + '.checkpoint'
+
+
+def temperature_filename(samplename):
+	# name of the file with the heaterblock temperature readings that goes with the data file of a sample:
+	return samplename + '.Tlog'
+
+
+def sweep_plan_hash(plan):
+	# hash of the test configuration / sweep plan (to check that a resumed run uses the same configuration as the interrupted run):
+	return hashlib.sha1(json.dumps(plan, sort_keys=True).encode()).hexdigest()
+
+
+def read_checkpoint(samplename):
+	# read checkpoint file (JSON dictionary) of a sample, return None if there is no (valid) checkpoint:
+	f = checkpoint_filename(samplename)
+	try:
+		with open(f, 'r') as fp:
+			data = json.load(fp)
+		if not isinstance(data, dict):
+			raise ValueError('Unexpected data format in ' + f)
+	except FileNotFoundError:
+		data = None
+	except Exception as e:
+		get_logger('curvetrace_tools').warning('Could not read checkpoint file ' + f + ' (' + repr(e) + ').')
+		data = None
+	return data
+
+
+def write_checkpoint(samplename, data):
+	# write checkpoint file (JSON dictionary) of a sample (replaces existing file in one go, so a crash never leaves a half-written checkpoint):
+	f = checkpoint_filename(samplename)
+	try:
+		with open(f + '.tmp', 'w') as fp:
+			json.dump(data, fp)
+			fp.flush()
+			os.fsync(fp.fileno())
+		os.replace(f + '.tmp', f)
+	except Exception as e:
+		get_logger('curvetrace_tools').warning('Could not write checkpoint file ' + f + ' (' + repr(e) + ').')
+
+
+def remove_checkpoint(samplename):
+	# remove checkpoint file of a sample (if any):
+	try:
+		os.remove(checkpoint_filename(samplename))
+	except FileNotFoundError:
+		pass
+
 
 ###############
 # get logger  #
@@ -5,9 +5,10 @@ Python class for heaterblock object.
 import logging
 import time
 import numpy as np
+from collections import deque
 
 from simple_pid import PID
-from threading import Thread
+from threading import Thread, Event, Condition, RLock
 from pypsucurvetrace.temperaturesensor_MAXIM import temperaturesensor_MAXIM as TSENS
 from pypsucurvetrace.powersupply import PSU
 from pypsucurvetrace.curvetrace_tools import get_logger
@@ -15,6 +16,12 @@ from pypsucurvetrace.curvetrace_tools import get_logger
 # set up logger:
 logger = get_logger('heaterblock')
 
+# max. time to wait for a new T sensor reading (s):
+SAMPLE_TIMEOUT = 5.0
+
+# max. number of T readings kept in memory (older readings are dropped, the history file keeps all readings):
+T_HISTORY_MAX = 1000000
+
 
 # heater class (dummy):
 class heater:
@@ -32,13 +39,24 @@ class heater:
 
 		# thread to read T sensor and for PID control:
 		self._controller = None
+		self._sampler = None		# thread to read T sensor in the background
+		self._T_stable = Event()	# set while the heaterblock temperature is stable (updated with each T reading and with each change of the target temperature)
+		self._target_T_val = None
+		self._target_T_tol = None
+		self._T_history = time_series(maxlen=T_HISTORY_MAX)	# T readings
+		self._T_history_file = None	# file to write the T readings to
+		self._T_lock = RLock()		# protects T buffer, T history and history file (shared with the sampler thread)
+		self._manual_power = None	# heater power set manually (bypassing the PID controller, e.g. for PID auto-tuning)
+		self._PID_interval = 1.0	# time between PID iterations (s)
+		self._write_deadband = None	# min. change of heater PSU voltage before a new value is written to the PSU (V)
+		self._last_voltage = None	# last voltage written to the heater PSU
 
 
 		# try to connect / configure PSU and TSENSOR, and start controller thread:
 		try:
 
 			# read from config file and set up heater accordingly:
-			self._T_buffer         = tuple(None for i in range(int(config['HEATERBLOCK']['TBUFFER_NUM'])))
+			self._T_buffer         = ring_buffer(int(config['HEATERBLOCK']['TBUFFER_NUM']))
 			self._T_buffer_seconds = float(config['HEATERBLOCK']['TBUFFER_INTERVAL'])
 			self._T_buffer_last    = time.time() - self._T_buffer_seconds
 			if config['HEATERBLOCK']['TEMPSENS_TYPE'].upper() != 'DS1820':
@@ -50,6 +68,14 @@ class heater:
 			self._TSENS = TSENS(config['HEATERBLOCK']['TEMPSENS_COMPORT'] , romcode = '')
 			self._TSENS_configured = True
 
+			# start reading the T sensor in the background:
+			try:
+				TSENS_interval = float(config['HEATERBLOCK']['TEMPSENS_INTERVAL'])
+			except:
+				TSENS_interval = 0.0
+			self._sampler = temperature_sampler_thread(self._TSENS, interval=TSENS_interval, callback=self._add_T_sample)
+			self._sampler.start()
+
 			# connect / configure PSU:
 			self._PSU = PSU(config['HEATERBLOCK']['PSU_COMPORT'],config['HEATERBLOCK']['PSU_TYPE'],'HEATERBLOCK_PSU')
 			self.turn_off()
@@ -70,6 +96,17 @@ class heater:
 			self._PID_Kp = float(config['HEATERBLOCK']['KP'])
 			self._PID_Ki = float(config['HEATERBLOCK']['KI'])
 			self._PID_Kd = float(config['HEATERBLOCK']['KD'])
+
+			# PID interval and deadband of heater PSU voltage writes (optional):
+			try:
+				self._PID_interval = float(config['HEATERBLOCK']['PID_INTERVAL'])
+			except:
+				pass
+			try:
+				self._write_deadband = float(config['HEATERBLOCK']['WRITE_DEADBAND'])
+			except:
+				self._write_deadband = self._PSU.VRESSET
+				pass
 			
 			# heater controller thread:
 			self._controller = heater_control_thread(self)
@@ -88,6 +125,12 @@ class heater:
 			pass
 
 
+	def set_DUT_PSUs(self, DUT_PSU1 = None, DUT_PSU2 = None):
+		# set DUT PSUs (heat input from the DUT is taken into account for heater power control):
+		self._DUT_PSU1 = DUT_PSU1
+		self._DUT_PSU2 = DUT_PSU2
+
+
 	def get_DUT_heating_power(self):
 		P = 0.0
 		if self._DUT_PSU1 is not None:
@@ -111,30 +154,91 @@ class heater:
 				    power  = min((power, self.max_power))  # make sure power is not more than max. allowed values (the PID may want that, but we can't)
 				    voltage = np.sqrt(power*self._heater_R)
 				    voltage = min( voltage, self._PSU.VMAX )
-				    self._PSU.setVoltage(voltage,wait_stable=False)
+				    # only write to the PSU if the voltage changed by more than the deadband (but always write zero voltage, to make sure the heater is off):
+				    if ( self._last_voltage is None ) or ( abs(voltage-self._last_voltage) >= self._write_deadband ) or ( voltage == 0.0 and self._last_voltage != 0.0 ):
+					    self._PSU.setVoltage(voltage,wait_stable=False)
+					    self._last_voltage = voltage
+					    if self._controller is not None:
+						    self._controller.count_write()
 				except Exception as e:
 					logger.warning('Could not set heater power: ' + repr(e))
 	
 		
-	def get_temperature(self, do_read = True):
-		# get T sensor reading:
-		if self._TSENS is None:
+	def _add_T_sample(self, temp, t):
+		# add T sensor reading taken at time t to T history and T buffer (called by the sampler thread):
+		with self._T_lock:
+			self._T_history.add(t, temp)
+			f = self._T_history_file
+			if f is not None:
+				try:
+					f.write("{:.3f}".format(t) + ' ' + "{:.4f}".format(temp) + ' ' + str(self._target_T_val) + '\n')
+					f.flush()
+				except Exception as e:
+					logger.warning('Could not write heaterblock temperature to file: ' + repr(e))
+			if self._T_buffer_last + self._T_buffer_seconds < t:
+				self._T_buffer.add(t, temp)
+				self._T_buffer_last = t
+				self._update_stability()
+
+
+	def get_temperature_history(self):
+		# T sensor readings since the start of the heaterblock (numpy arrays of time stamps and temperature values, at most T_HISTORY_MAX readings):
+		with self._T_lock:
+			return self._T_history.data()
+
+
+	def get_temperature_buffer_stats(self):
+		# statistics of the T buffer used to determine temperature stability (None if the buffer is not full yet):
+		# min., max. and mean temperature (°C), and temperature drift (K/min)
+		with self._T_lock:
+			if ( self._sampler is None ) or ( not self._T_buffer.is_full() ):
+				return None
+			return { 'min': float(self._T_buffer.min()), 'max': float(self._T_buffer.max()), 'mean': float(self._T_buffer.mean()), 'drift': 60.0*float(self._T_buffer.slope()) }
+
+
+	def set_history_file(self, filename, append=False):
+		# write T sensor readings to file (close the current file if filename is None):
+		# (the file is closed / opened with the T lock held, so the sampler thread never writes to a closed file)
+		with self._T_lock:
+			f = self._T_history_file
+			self._T_history_file = None
+			if f is not None:
+				f.close()
+			if ( filename is not None ) and ( self._sampler is not None ):
+				if append:
+					f = open(filename, 'a')
+				else:
+					f = open(filename, 'w')
+					f.write('% Heaterblock temperature readings\n% time (s since epoch)   T (°C)   target T (°C)\n')
+				self._T_history_file = f
+
+
+	def get_temperature_sample(self):
+		# latest T sensor reading and its time stamp (None, None if there is no reading yet):
+		if self._sampler is None:
+			return None, None
+		return self._sampler.latest()
+
+
+	def wait_for_temperature_sample(self, after=None):
+		# wait for a new T sensor reading taken after time 'after', return reading and its time stamp:
+		if self._sampler is None:
+			return None, None
+		return self._sampler.wait_for_sample(after=after, timeout=SAMPLE_TIMEOUT)
+
+
+	def get_temperature(self, do_read = True, max_age = None):
+		# get latest T sensor reading (from the sampler thread, without waiting for a new T conversion):
+		# do_read: wait for the first reading if there is no reading yet
+		# max_age (optional): wait for a new reading if the latest reading is older than max_age (s)
+		if self._sampler is None:
 			temp = None
 		else:
-			if self._T_buffer[-1] is None:
-				do_read = True
-			if do_read:
-				temp,unit = self._TSENS.temperature()
-				if unit != 'deg.C':
-					raise ValueError('T value has wrong unit (' + unit + ').')
-				
-				# add to T buffer:
-				now = time.time()
-				if self._T_buffer_last + self._T_buffer_seconds < now:
-					self._T_buffer = self._T_buffer[1:] + (temp,)
-					self._T_buffer_last = now
-
-			temp = self._T_buffer[-1] # return last entry in T_buffer
+			temp, t = self._sampler.latest()
+			if ( temp is None ) and do_read:
+				temp, t = self._sampler.wait_for_sample(timeout=SAMPLE_TIMEOUT)
+			elif ( max_age is not None ) and ( t is not None ) and ( time.time() - t > max_age ):
+				temp, t = self._sampler.wait_for_sample(after=t, timeout=SAMPLE_TIMEOUT)
 
 		return temp
 		
@@ -149,27 +253,44 @@ class heater:
 		
 	
 	def temperature_is_stable(self):
+		# check if the heaterblock temperature is stable (O(1), the stability is determined with each T reading):
+		if self._target_T_val is None:
+			return True
+		return self._T_stable.is_set()
+
+
+	def _update_stability(self):
+		# determine if the heaterblock temperature is stable, and signal the result to threads waiting for stable temperature:
+		# (the caller must hold the T lock, the T buffer is updated by the sampler thread)
 		is_stable = True
 		T_tgt, T_tol = self.get_target_temperature()
 		
 		if T_tgt != None:
-			if any(map(lambda x: x is None, self._T_buffer)):
-				# buffer still contains some None values, so we need more readings
+			if not self._T_buffer.is_full():
+				# we need more readings
 				is_stable = False
 			
-			elif min(self._T_buffer) < T_tgt - T_tol:
+			elif self._T_buffer.min() < T_tgt - T_tol:
 				is_stable = False
 				
-			elif max(self._T_buffer) > T_tgt + T_tol:
+			elif self._T_buffer.max() > T_tgt + T_tol:
 				is_stable = False
 		
-		return is_stable
+		if is_stable:
+			self._T_stable.set()
+		else:
+			self._T_stable.clear()
 
 
 	def set_target_temperature(self, T_value, T_tolerance):
 		# set target temperature:
-		self._target_T_val = T_value
-		self._target_T_tol = T_tolerance
+		with self._T_lock:
+			self._target_T_val = T_value
+			self._target_T_tol = T_tolerance
+			try:
+				self._update_stability()
+			except AttributeError:
+				pass # T buffer not configured (heaterblock not set up)
 
 
 	def get_target_temperature(self):
@@ -194,6 +315,7 @@ class heater:
 			try:
 				self._PSU.turnOn()
 				self._PSU.setVoltage(0.0,wait_stable=False) # set V = 0 to avoid uncontrolled power / current draw
+				self._last_voltage = 0.0
 				self._PSU.setCurrent(self._PSU.IMAX,wait_stable=False) # set current to max. to allow power control based on voltage limit only
 				self._power_is_on = True
 			except Exception as e:
@@ -214,9 +336,15 @@ class heater:
 		return self._power_is_on
 
 
+	def is_configured(self):
+		# True if the heater PSU and T sensor are set up and the PID controller is running:
+		return self._controller is not None
+
+
 	def wait_for_stable_T(self, DUT_PSU_allowed_turn_off=None, terminal_output=False):
 		
-		if not self.is_on():
+		if ( not self.is_on() ) or self.temperature_is_stable():
+			# no need to wait (O(1) check, the stability is signalled with each T reading):
 			delay = 0.0
 			
 		else:
@@ -227,6 +355,7 @@ class heater:
 			PSU_turned_off = False
 			
 			T_last = None
+			t_now = None
 			nn = 0
 			
 			while not self.temperature_is_stable():
@@ -238,10 +367,14 @@ class heater:
 						is_first_line = False
 
 				# if necessary and allowed: turn DUT PSU off (to speed up / allow cooling of heaterblock without heat input from DUT)
+				# (wait for the next T sensor reading)
 				T_tgt, T_tol = self.get_target_temperature()
-				T_now        = self.get_temperature(do_read=True)
+				t_prev = t_now
+				T_now, t_now = self.wait_for_temperature_sample(after=t_now)
+				if ( t_now is None ) or ( t_now == t_prev ):
+					time.sleep(1.0) # no new T reading (T sensor failure?), don't spin
 				
-				if T_now > T_tgt + T_tol:
+				if ( T_now is not None ) and ( T_now > T_tgt + T_tol ):
 				    if DUT_PSU_allowed_turn_off is not None:
 				        if T_last is not None:
 				            if T_now >= T_last:
@@ -253,10 +386,8 @@ class heater:
 				                        DUT_PSU_allowed_turn_off.turnOff()
 				                        PSU_turned_off = True
 							        
-				msg = 'Waiting for heaterblock temperature (current: ' + self.get_temperature_string() +' °C, target: ' + self.get_target_temperature_string() + ' °C)...'
+				msg = 'Waiting for heaterblock temperature (current: ' + self.get_temperature_string(do_read=False) +' °C, target: ' + self.get_target_temperature_string() + ' °C)...'
 				print (msg, end="\r")
-				# time.sleep(0.5)
-				# T_now = HEATER.get_temperature()
 				T_last = T_now
 			
 			if not is_first_line:
@@ -271,10 +402,39 @@ class heater:
 		return delay
 		
 
+	def set_manual_power(self, power):
+		# set heater power manually, bypassing the PID controller (power = None: return to PID control):
+		self._manual_power = power
+
+
+	def set_PID_gains(self, Kp, Ki, Kd):
+		# set coefficients of the PID controller:
+		self._PID_Kp = Kp
+		self._PID_Ki = Ki
+		self._PID_Kd = Kd
+		if self._controller is not None:
+			self._controller.set_gains(Kp, Ki, Kd)
+
+
+	def get_PID_gains(self):
+		return self._PID_Kp, self._PID_Ki, self._PID_Kd
+
+
+	def get_controller_stats(self):
+		# statistics of the PID controller thread (None if the controller is not running):
+		if self._controller is None:
+			return None
+		return self._controller.stats()
+
+
 	def terminate_controller_thread(self):
 		# turn off PSU / heater power:
 		if self._controller is not None:
 			self._controller.terminate()
+		# stop reading the T sensor:
+		if self._sampler is not None:
+			self._sampler.terminate()
+		self.set_history_file(None)
 
 
 
@@ -283,11 +443,20 @@ class heater_control_thread(Thread):
 
 
 	def __init__(self, heaterblock):
-	### def __init__(self, heaterblock, interval_seconds=1):
 		Thread.__init__(self)
 		
 		self._heaterblock = heaterblock
-		### self._interval = interval_seconds
+		self._interval = heaterblock._PID_interval
+		self._stop_event = Event()
+
+		# PID loop statistics:
+		self._N = 0		# number of PID iterations
+		self._N_late = 0	# number of PID iterations that took longer than the interval (skipped ticks)
+		self._N_write = 0	# number of heater PSU voltage writes
+		self._jitter_sum = 0.0	# sum of delays of the PID iterations relative to their scheduled start time
+		self._jitter_max = 0.0	# max. delay of the PID iterations relative to their scheduled start time
+		self._t_start = None	# start time of the thread
+		self._cpu = 0.0		# CPU time used by the PID iterations (s)
 		
 		# Init and configure PID controller:
 		self._pid = None
@@ -307,20 +476,43 @@ class heater_control_thread(Thread):
 	
 		try:
 			self._is_running = True
+			self._t_start = time.monotonic()
+			t_next = self._t_start
+			t_last = None # time stamp of last T sensor reading
 
 			while self._do_run:
 			
-				# sleep between PID iterations:
-				### last_time = time.time()
-				### while time.time() < last_time + self._interval:
-				### 	time.sleep(self._interval/10)
+				# wait for the next PID iteration (fixed rate, skip missed iterations if the last iteration took too long):
+				now = time.monotonic()
+				if t_next > now:
+					if self._stop_event.wait(t_next - now):
+						break # thread was terminated
+					now = time.monotonic()
+				jitter = now - t_next
+				if jitter >= self._interval:
+					self._N_late += 1
+					t_next = t_next + self._interval * np.floor(jitter/self._interval)
+					jitter = now - t_next
+				t_next = t_next + self._interval
+				self._N += 1
+				self._jitter_sum += jitter
+				self._jitter_max = max(self._jitter_max, jitter)
+				cpu0 = time.thread_time()
 				
-				# get heaterblock temperature:
-				T = self._heaterblock.get_temperature(do_read=True)
+				# get heaterblock temperature (skip this iteration if there is no new T sensor reading):
+				T, t = self._heaterblock.get_temperature_sample()
+				if ( t is None ) or ( t == t_last ):
+					self._cpu += time.thread_time() - cpu0
+					continue
+				t_last = t
 
 				# determine and set heating power:
 				if self._heaterblock.is_on():
-					if T != None:
+					if self._heaterblock._manual_power is not None:
+						self._heaterblock.set_power(self._heaterblock._manual_power) # manual power, no PID control
+						self._pid.reset()
+
+					elif T != None:
 						
 						T_target, T_tol = self._heaterblock.get_target_temperature()
 						
@@ -330,6 +522,8 @@ class heater_control_thread(Thread):
 							self._pid.setpoint = T_target  # update target value for PID
 							power = self._pid(T)                             # determine heater power
 							self._heaterblock.set_power(power)               # set heater power
+
+				self._cpu += time.thread_time() - cpu0
 							
 		except Exception as e:
 			logger.warning('Heaterblock PID controller failed: ' + repr(e))
@@ -346,7 +540,275 @@ class heater_control_thread(Thread):
 			self._is_running = False		
 	
 	
+	def set_gains(self, Kp, Ki, Kd):
+		# set coefficients of the PID controller:
+		self._pid.tunings = (Kp, Ki, Kd)
+		self._pid.reset()
+
+
+	def count_write(self):
+		# count heater PSU voltage writes:
+		self._N_write += 1
+
+
+	def stats(self):
+		'''
+		s = heater_control_thread.stats()
+
+		Statistics of the PID loop.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		s: dictionary with the number of PID iterations (N), PID interval (interval, s), mean and max. delay of the PID iterations
+		   relative to their scheduled start time (jitter_mean, jitter_max, s), number of late iterations that took longer than the
+		   interval (N_late), number of heater PSU voltage writes (N_write), and CPU use of the controller thread (cpu, fraction of wall time)
+		'''
+
+		cpu = None
+		if self._t_start is not None:
+			cpu = self._cpu / max( time.monotonic() - self._t_start , 1E-9 )
+		return { 'N': self._N, 'interval': self._interval, 'jitter_mean': self._jitter_sum/max(self._N, 1), 'jitter_max': self._jitter_max,
+		         'N_late': self._N_late, 'N_write': self._N_write, 'cpu': cpu }
+
+
 	def terminate(self):
 		self._do_run = False
+		self._stop_event.set()
 		while self._is_running:
 			time.sleep(0.01)
+
+
+
+# thread to read T sensor in the background:
+class temperature_sampler_thread(Thread):
+
+
+	def __init__(self, sensor, interval=0.0, callback=None):
+		# sensor: T sensor object
+		# interval (optional): min. time between the start of T conversions (s), 0 for back-to-back conversions
+		# callback (optional): function callback(temp, t) called with each new reading
+		Thread.__init__(self, daemon=True)
+		
+		self._sensor = sensor
+		self._interval = interval
+		self._callback = callback
+		self._stop_event = Event()
+		self._new_sample = Condition()
+		self._T = None		# latest reading
+		self._t = None		# time of latest reading (time.time())
+		self._N = 0		# number of readings
+		self._stopped = False
+
+
+	def run(self):
+
+		try:
+			while not self._stop_event.is_set():
+				t0 = time.monotonic()
+
+				# start T conversion, wait for conversion without blocking the T sensor port, and read the result:
+				try:
+					if hasattr(self._sensor, 'start_conversion'):
+						t_conv = self._sensor.start_conversion()
+						if self._stop_event.wait(t_conv):
+							break
+						temp, unit = self._sensor.read_conversion()
+					else:
+						temp, unit = self._sensor.temperature()
+				except Exception as e:
+					logger.warning('Could not read T sensor: ' + repr(e))
+					temp, unit = None, '?'
+
+				if temp is None:
+					# reading failed, try again later:
+					if self._stop_event.wait(1.0):
+						break
+					continue
+				if unit != 'deg.C':
+					logger.warning('T value has wrong unit (' + unit + ').')
+					continue
+
+				# publish the reading (after the callback, so that threads waiting for the new reading see the results of the callback):
+				t = time.time()
+				if self._callback is not None:
+					self._callback(temp, t)
+				with self._new_sample:
+					self._T = temp
+					self._t = t
+					self._N += 1
+					self._new_sample.notify_all()
+
+				# wait for the next conversion:
+				dt = self._interval - ( time.monotonic() - t0 )
+				if dt > 0.0:
+					if self._stop_event.wait(dt):
+						break
+
+		except Exception as e:
+			logger.warning('T sensor sampler failed: ' + repr(e))
+
+		finally:
+			with self._new_sample:
+				self._stopped = True
+				self._new_sample.notify_all()
+
+
+	def latest(self):
+		# latest reading and its time stamp (None, None if there is no reading yet):
+		with self._new_sample:
+			return self._T, self._t
+
+
+	def wait_for_sample(self, after=None, timeout=None):
+		# wait for a reading taken after time 'after' (any reading if after is None), return reading and time stamp (latest reading on timeout):
+		with self._new_sample:
+			self._new_sample.wait_for(lambda: ( ( self._t is not None ) and ( ( after is None ) or ( self._t > after ) ) ) or self._stopped, timeout=timeout)
+			return self._T, self._t
+
+
+	def terminate(self):
+		self._stop_event.set()
+		self.join(timeout=SAMPLE_TIMEOUT)
+
+
+
+# ring buffer of the last N values of a time series, with running statistics (O(1) updates):
+class ring_buffer:
+
+
+	def __init__(self, size):
+		# size: number of values in the buffer
+		self._size = size
+		self._t = np.zeros(size)
+		self._y = np.zeros(size)
+		self._k = 0		# number of values added
+		self._t0 = None		# reference time (for numerical precision of the running sums)
+		self._min = deque()	# monotonic queues of (index, value) for running min / max
+		self._max = deque()
+		self._sums = np.zeros(4)	# sums of t, y, t*t, t*y of the values in the buffer
+
+
+	def add(self, t, y):
+		if self._t0 is None:
+			self._t0 = t
+		t = t - self._t0
+		i = self._k % self._size
+
+		# update running sums (remove the value that drops out of the buffer):
+		if self._k >= self._size:
+			self._sums -= [ self._t[i], self._y[i], self._t[i]**2, self._t[i]*self._y[i] ]
+		self._sums += [ t, y, t**2, t*y ]
+		self._t[i] = t
+		self._y[i] = y
+
+		# update running min / max:
+		for q, better in [ (self._min, lambda a, b: a <= b) , (self._max, lambda a, b: a >= b) ]:
+			while q and better(y, q[-1][1]):
+				q.pop()
+			q.append( (self._k, y) )
+			while q[0][0] <= self._k - self._size:
+				q.popleft()
+
+		self._k += 1
+
+		# recompute the running sums once per buffer cycle (avoid accumulation of rounding errors):
+		if self._k % self._size == 0:
+			self._sums = np.array( [ np.sum(self._t), np.sum(self._y), np.sum(self._t**2), np.sum(self._t*self._y) ] )
+
+
+	def __len__(self):
+		return min(self._k, self._size)
+
+
+	def is_full(self):
+		return self._k >= self._size
+
+
+	def last(self):
+		if self._k == 0:
+			return None
+		return self._y[(self._k-1) % self._size]
+
+
+	def min(self):
+		if self._k == 0:
+			return None
+		return self._min[0][1]
+
+
+	def max(self):
+		if self._k == 0:
+			return None
+		return self._max[0][1]
+
+
+	def mean(self):
+		if self._k == 0:
+			return None
+		return self._sums[1] / len(self)
+
+
+	def slope(self):
+		# slope of the linear regression of the values vs. time (per second):
+		n = len(self)
+		St, Sy, Stt, Sty = self._sums
+		d = n*Stt - St**2
+		if ( n < 2 ) or ( d <= 0.0 ):
+			return None
+		return ( n*Sty - St*Sy ) / d
+
+
+	def values(self):
+		# time stamps and values in the buffer (chronological order):
+		n = len(self)
+		if n == 0:
+			return np.array([]), np.array([])
+		k = np.arange(self._k - n, self._k) % self._size
+		return self._t[k] + self._t0, self._y[k]
+
+
+
+# time series (numpy arrays, amortized O(1) updates):
+# unlimited length if maxlen is None, otherwise the oldest half of the data is dropped once maxlen values are stored
+class time_series:
+
+
+	def __init__(self, size=1024, maxlen=None):
+		if maxlen is not None:
+			size = max( 1 , min(size, maxlen) )
+		self._t = np.zeros(size)
+		self._y = np.zeros(size)
+		self._n = 0
+		self._maxlen = maxlen
+
+
+	def add(self, t, y):
+		if self._n == len(self._t):
+			if ( self._maxlen is not None ) and ( self._n >= self._maxlen ):
+				# drop the oldest half of the data:
+				n_drop = self._n - self._maxlen//2
+				self._t[:self._n-n_drop] = self._t[n_drop:self._n]
+				self._y[:self._n-n_drop] = self._y[n_drop:self._n]
+				self._n -= n_drop
+			else:
+				# double the array size (up to maxlen):
+				n = 2*len(self._t)
+				if self._maxlen is not None:
+					n = min(n, self._maxlen)
+				self._t = np.concatenate( (self._t, np.zeros(n-len(self._t))) )
+				self._y = np.concatenate( (self._y, np.zeros(n-len(self._y))) )
+		self._t[self._n] = t
+		self._y[self._n] = y
+		self._n += 1
+
+
+	def __len__(self):
+		return self._n
+
+
+	def data(self):
+		# copy of the time stamps and values:
+		return self._t[:self._n].copy(), self._y[:self._n].copy()
+
@@ -0,0 +1,358 @@
+# This file is part of pypsucurvetrace, a toolbox for I/V curve tracing of electronic parts using programmable power supplies.
+#
+# pypsucurvetrace is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# pypsucurvetrace is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with pypsucurvetrace.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import configparser
+import datetime
+import math
+import time
+import numpy as np
+from pathlib import Path
+
+import pypsucurvetrace.heaterblock as heaterblock
+from pypsucurvetrace.curvetrace_tools import say_hello, get_logger, error_and_exit
+
+
+# set up logger:
+logger = get_logger('heatertune')
+
+# PID tuning rules (Kp / Ku, Ti / Pu, Td / Pu):
+TUNING_RULES = {
+	'TL': ( 1.0/2.2 , 2.2 , 1.0/6.3 ),	# Tyreus-Luyben (little overshoot, robust)
+	'ZN': ( 0.6     , 0.5 , 0.125   ),	# Ziegler-Nichols (fast, more overshoot)
+	'NO': ( 0.2     , 0.5 , 1.0/3.0 ),	# Ziegler-Nichols "no overshoot"
+}
+
+# number of relay cycles used to adjust the relay bias before the ultimate gain and period are determined:
+N_BIAS_CYCLES = 2
+
+
+if __name__ == "__main__":
+    htune()
+
+
+def wait_for_stable_T(HEATER, timeout, terminal_output=True):
+	'''
+	ok = wait_for_stable_T(HEATER, timeout, terminal_output=True)
+
+	Wait until the heaterblock temperature is stable at the target temperature.
+
+	INPUT:
+	HEATER: heaterblock object
+	timeout: max. waiting time (s)
+	terminal_output (optional): show the heaterblock temperature on the terminal
+
+	OUTPUT:
+	ok: True if the temperature is stable, False if the timeout was reached
+	'''
+
+	t0 = time.time()
+	t = None
+	msg = ''
+	while not HEATER.temperature_is_stable():
+		if time.time() - t0 > timeout:
+			break
+		t_prev = t
+		T, t = HEATER.wait_for_temperature_sample(after=t)
+		if ( t is None ) or ( t == t_prev ):
+			time.sleep(1.0) # no new T reading (T sensor failure?), don't spin
+		if terminal_output:
+			msg = 'Waiting for heaterblock temperature (current: ' + HEATER.get_temperature_string(do_read=False) + ' °C, target: ' + HEATER.get_target_temperature_string() + ' °C)...'
+			print (msg, end="\r")
+	if terminal_output:
+		print (' '*len(msg), end="\r") # clear previous line from terminal
+
+	return HEATER.temperature_is_stable()
+
+
+def relay_test(HEATER, T_setpoint, P_max, hysteresis=0.1, N_cycles=3, timeout=7200.0, terminal_output=True):
+	'''
+	r = relay_test(HEATER, T_setpoint, P_max, hysteresis=0.1, N_cycles=3, timeout=7200.0, terminal_output=True)
+
+	Relay feedback test (Astrom-Hagglund) of the heaterblock: the heater power is switched between a high and a low value whenever the temperature crosses
+	the setpoint (with hysteresis), which results in a steady oscillation of the temperature around the setpoint. The ultimate gain and the ultimate period
+	of the heaterblock are determined from the amplitude and the period of the oscillation. The relay starts with 0 / P_max, and the relay bias is adjusted
+	during the first cycles such that the oscillation is symmetric around the power required to hold the setpoint.
+
+	INPUT:
+	HEATER: heaterblock object (turned on)
+	T_setpoint: temperature setpoint (°C)
+	P_max: max. heater power used for the relay (W)
+	hysteresis (optional): hysteresis of the relay (K)
+	N_cycles (optional): number of oscillation cycles used to determine the ultimate gain and period
+	timeout (optional): max. duration of the test (s)
+	terminal_output (optional): show the progress of the test on the terminal
+
+	OUTPUT:
+	r: dictionary with the ultimate gain Ku (W/K), ultimate period Pu (s), oscillation amplitude a (K), relay amplitude d (W), relay bias P_bias (W),
+	   and the relative spread of the oscillation periods (None if the test failed)
+	'''
+
+	P_low  = 0.0
+	P_high = P_max
+	heating = True
+	HEATER.set_manual_power(P_high)
+
+	t_up = []		# times of switching the relay to P_high
+	t_down = []		# times of switching the relay to P_low
+	tt = []			# times of the T readings
+	TT = []			# T readings
+	t_cycle = None		# start of the current relay cycle
+	N_bias = 0		# number of relay bias adjustments
+	t0 = time.time()
+	t = None
+	msg = ''
+
+	try:
+		while True:
+			if time.time() - t0 > timeout:
+				logger.warning('Relay test did not result in ' + str(N_cycles) + ' stable oscillation cycles within ' + str(timeout) + ' s.')
+				return None
+
+			t_prev = t
+			T, t = HEATER.wait_for_temperature_sample(after=t)
+			if ( t is None ) or ( t == t_prev ) or ( T is None ):
+				time.sleep(1.0) # no new T reading (T sensor failure?), don't spin
+				continue
+			tt.append(t)
+			TT.append(T)
+
+			# switch relay:
+			if heating and ( T > T_setpoint + hysteresis ):
+				heating = False
+				HEATER.set_manual_power(P_low)
+				t_down.append(t)
+			elif ( not heating ) and ( T < T_setpoint - hysteresis ):
+				heating = True
+				HEATER.set_manual_power(P_high)
+				t_up.append(t)
+
+				if t_cycle is not None:
+					# adjust relay bias to the mean power of the last cycle (symmetric oscillation):
+					if N_bias < N_BIAS_CYCLES:
+						P_bias = ( P_high*(t_down[-1]-t_cycle) + P_low*(t-t_down[-1]) ) / (t-t_cycle)
+						d = min( P_bias , P_max-P_bias )
+						P_low  = P_bias - d
+						P_high = P_bias + d
+						HEATER.set_manual_power(P_high)
+						N_bias += 1
+						t_up = [ t ] # discard the cycles before the bias adjustment
+				t_cycle = t
+
+			if terminal_output:
+				msg = 'Relay test: T = ' + "{:.2f}".format(T) + ' °C (setpoint: ' + "{:.2f}".format(T_setpoint) + ' °C), heater power ' + "{:.1f}".format(P_high if heating else P_low) + ' W, ' + str(max(0,len(t_up)-1)) + ' of ' + str(N_cycles) + ' cycles completed...'
+				print (msg, end="\r")
+
+			if ( N_bias >= N_BIAS_CYCLES ) and ( len(t_up) > N_cycles ):
+				break # done
+
+	finally:
+		HEATER.set_manual_power(None)
+		if terminal_output:
+			print (' '*len(msg), end="\r") # clear previous line from terminal
+
+	# period and amplitude of the oscillation:
+	tt = np.array(tt)
+	TT = np.array(TT)
+	periods = np.diff(t_up[-N_cycles-1:])
+	amplitudes = []
+	for k in range(len(t_up)-N_cycles-1, len(t_up)-1):
+		i = np.where( (tt >= t_up[k]) & (tt < t_up[k+1]) )[0]
+		amplitudes.append( (TT[i].max() - TT[i].min()) / 2.0 )
+	Pu = float(np.mean(periods))
+	a  = float(np.mean(amplitudes))
+
+	# ultimate gain (describing function of a relay with hysteresis):
+	d = (P_high - P_low) / 2.0
+	if a > hysteresis:
+		Ku = 4.0*d / ( math.pi * math.sqrt(a**2 - hysteresis**2) )
+	else:
+		Ku = 4.0*d / ( math.pi * a )
+
+	return { 'Ku': Ku, 'Pu': Pu, 'a': a, 'd': d, 'P_bias': (P_high + P_low) / 2.0, 'spread': float(np.ptp(periods)/Pu) }
+
+
+def pid_gains(Ku, Pu, rule='TL'):
+	'''
+	Kp, Ki, Kd = pid_gains(Ku, Pu, rule='TL')
+
+	PID coefficients from the ultimate gain and the ultimate period.
+
+	INPUT:
+	Ku: ultimate gain (W/K)
+	Pu: ultimate period (s)
+	rule (optional): tuning rule, 'TL' (Tyreus-Luyben), 'ZN' (Ziegler-Nichols), or 'NO' (Ziegler-Nichols "no overshoot")
+
+	OUTPUT:
+	Kp, Ki, Kd: PID coefficients (W/K, W/(K s), W s/K)
+	'''
+
+	cp, ci, cd = TUNING_RULES[rule.upper()]
+	Kp = cp*Ku
+	Ki = Kp / (ci*Pu)
+	Kd = Kp * (cd*Pu)
+	return Kp, Ki, Kd
+
+
+def step_test(HEATER, T_target, T_tol, timeout=7200.0, terminal_output=True):
+	'''
+	t_settle, overshoot = step_test(HEATER, T_target, T_tol, timeout=7200.0, terminal_output=True)
+
+	Change the target temperature of the heaterblock and determine the settling time (time until the temperature stays within the tolerance of the target
+	temperature) and the overshoot of the temperature.
+
+	INPUT:
+	HEATER: heaterblock object (turned on, PID control)
+	T_target: new target temperature (°C)
+	T_tol: tolerance of the target temperature (K)
+	timeout (optional): max. duration of the test (s)
+	terminal_output (optional): show the progress of the test on the terminal
+
+	OUTPUT:
+	t_settle: settling time (s, None if the temperature did not settle within the timeout)
+	overshoot: overshoot of the temperature beyond the target temperature (K)
+	'''
+
+	T0 = HEATER.get_temperature()
+	t0 = time.time()
+	HEATER.set_target_temperature(T_target, T_tol)
+	if not wait_for_stable_T(HEATER, timeout, terminal_output):
+		return None, None
+
+	t, T = HEATER.get_temperature_history()
+	i = t >= t0
+	t = t[i]
+	T = T[i]
+
+	# time of the first reading after the last reading outside the tolerance band:
+	k = np.where( np.abs(T-T_target) > T_tol )[0]
+	if len(k) == 0:
+		t_settle = t[0] - t0
+	else:
+		t_settle = t[min(k[-1]+1, len(t)-1)] - t0
+
+	if T_target >= T0:
+		overshoot = max( 0.0 , T.max() - T_target )
+	else:
+		overshoot = max( 0.0 , T_target - T.min() )
+
+	return float(t_settle), float(overshoot)
+
+
+def htune():
+    ################
+    # main program #
+    ################
+
+    # input arguments:
+    parser = argparse.ArgumentParser(description='heatertune (pypsucurvetrace) is a Python program to determine the PID coefficients of the heaterblock controller from a relay feedback test.')
+    parser.add_argument('-T', '--temperature', type=float, required=True, help='heaterblock temperature used for the tuning (°C)')
+    parser.add_argument('--power', type=float, help='max. heater power used for the relay test (W, default: MAX_POWER of the heaterblock)')
+    parser.add_argument('--hysteresis', type=float, default=0.1, help='hysteresis of the relay (K, default: 0.1)')
+    parser.add_argument('--cycles', type=int, default=3, help='number of oscillation cycles used to determine the ultimate gain and period (default: 3)')
+    parser.add_argument('--rule', choices=['TL', 'ZN', 'NO'], default='TL', help='PID tuning rule: TL (Tyreus-Luyben, default), ZN (Ziegler-Nichols), or NO (Ziegler-Nichols "no overshoot")')
+    parser.add_argument('--step', type=float, default=2.0, help='temperature step used to determine the settling time with the new PID coefficients (K, default: 2.0, use 0 to skip the step test)')
+    parser.add_argument('--tol', type=float, default=0.2, help='temperature tolerance used to determine the settling time (K, default: 0.2)')
+    parser.add_argument('--timeout', type=float, default=7200.0, help='max. duration of the relay test and of the step test (s, default: 7200)')
+    parser.add_argument('-o', '--output', default='heatertune.txt', help='name of the output file with the suggested PID coefficients (default: heatertune.txt)')
+
+    # do not show a "hello" message
+    parser.add_argument('--nohello', action='store_true', help='Do not print the hello / about message (useful when the output needs further processing).')
+
+    # parse args:
+    args = parser.parse_args()
+
+    # Say Hello:
+    if not args.nohello:
+        say_hello('heatertune', 'PID tuning of the pypsucurvetrace heaterblock')
+
+    if args.cycles < 1:
+        error_and_exit(logger, 'Number of oscillation cycles must be at least 1.')
+    if args.hysteresis < 0.0:
+        error_and_exit(logger, 'Relay hysteresis must not be negative.')
+
+    # read PSU config file:
+    cfgfile = 'curvetrace_config.txt'
+    cfgfile = Path.home() / cfgfile
+    if not cfgfile.is_file():
+        error_and_exit(logger, 'Could not find config file ' + str(cfgfile) + '.')
+    configTESTER = configparser.ConfigParser()
+    configTESTER.read(cfgfile)
+
+    # set up heaterblock:
+    HEATER = heaterblock.heater( config=configTESTER, target_temperature=0.0 )
+    if not HEATER.is_configured():
+        error_and_exit(logger, 'Could not set up heaterblock.')
+
+    P_max = HEATER.max_power
+    if args.power is not None:
+        P_max = min( args.power , HEATER.max_power )
+
+    try:
+        # relay test:
+        logger.info('Relay test at ' + "{:.2f}".format(args.temperature) + ' °C with max. heater power ' + "{:.1f}".format(P_max) + ' W...')
+        HEATER.set_target_temperature(args.temperature, args.tol)
+        HEATER.turn_on()
+        r = relay_test(HEATER, args.temperature, P_max, hysteresis=args.hysteresis, N_cycles=args.cycles, timeout=args.timeout)
+        if r is None:
+	        error_and_exit(logger, 'Relay test failed.')
+        logger.info('Ultimate gain Ku = ' + "{:.4g}".format(r['Ku']) + ' W/K, ultimate period Pu = ' + "{:.1f}".format(r['Pu']) + ' s (oscillation amplitude ' + "{:.3f}".format(r['a']) + ' K, relay power ' + "{:.1f}".format(r['P_bias']) + ' ± ' + "{:.1f}".format(r['d']) + ' W).')
+        if r['spread'] > 0.2:
+	        logger.warning('Oscillation periods vary by ' + "{:.0f}".format(100*r['spread']) + '%, the PID coefficients may be inaccurate (try more cycles or a larger hysteresis).')
+
+        # PID coefficients:
+        Kp, Ki, Kd = pid_gains(r['Ku'], r['Pu'], args.rule)
+        logger.info('Suggested PID coefficients (' + args.rule + ' rule): KP = ' + "{:.4g}".format(Kp) + ', KI = ' + "{:.4g}".format(Ki) + ', KD = ' + "{:.4g}".format(Kd))
+        HEATER.set_PID_gains(Kp, Ki, Kd)
+
+        # step test with the new PID coefficients:
+        t_settle = None
+        overshoot = None
+        if args.step != 0.0:
+	        logger.info('Settling at ' + "{:.2f}".format(args.temperature) + ' °C with the new PID coefficients...')
+	        if not wait_for_stable_T(HEATER, args.timeout):
+		        logger.warning('Heaterblock temperature did not settle within ' + str(args.timeout) + ' s.')
+	        else:
+		        T_step = args.temperature + args.step
+		        logger.info('Step test: changing the target temperature to ' + "{:.2f}".format(T_step) + ' °C...')
+		        t_settle, overshoot = step_test(HEATER, T_step, args.tol, timeout=args.timeout)
+		        if t_settle is None:
+			        logger.warning('Heaterblock temperature did not settle within ' + str(args.timeout) + ' s after the step.')
+		        else:
+			        logger.info('Settling time = ' + "{:.1f}".format(t_settle) + ' s (tolerance ± ' + "{:.2f}".format(args.tol) + ' K), overshoot = ' + "{:.2f}".format(overshoot) + ' K.')
+
+        # write results to output file (the KP, KI, KD lines can be copied to the [HEATERBLOCK] section of the config file):
+        with open(args.output, 'w') as f:
+	        f.write('% heatertune (pypsucurvetrace), ' + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + '\n')
+	        f.write('% Relay test at ' + "{:.2f}".format(args.temperature) + ' °C: relay power ' + "{:.2f}".format(r['P_bias']) + ' ± ' + "{:.2f}".format(r['d']) + ' W, hysteresis ' + "{:.3f}".format(args.hysteresis) + ' K, ' + str(args.cycles) + ' cycles\n')
+	        f.write('% Ultimate gain Ku = ' + "{:.4g}".format(r['Ku']) + ' W/K, ultimate period Pu = ' + "{:.1f}".format(r['Pu']) + ' s, oscillation amplitude = ' + "{:.3f}".format(r['a']) + ' K\n')
+	        f.write('% Tuning rule: ' + args.rule + '\n')
+	        if t_settle is not None:
+		        f.write('% Step test ' + "{:.2f}".format(args.temperature) + ' -> ' + "{:.2f}".format(args.temperature+args.step) + ' °C: settling time = ' + "{:.1f}".format(t_settle) + ' s (tolerance ± ' + "{:.2f}".format(args.tol) + ' K), overshoot = ' + "{:.2f}".format(overshoot) + ' K\n')
+	        elif args.step != 0.0:
+		        f.write('% Step test: temperature did not settle\n')
+	        f.write('[HEATERBLOCK]\n')
+	        f.write('KP = ' + "{:.4g}".format(Kp) + '\n')
+	        f.write('KI = ' + "{:.4g}".format(Ki) + '\n')
+	        f.write('KD = ' + "{:.4g}".format(Kd) + '\n')
+        logger.info('Suggested PID coefficients written to ' + args.output + '.')
+
+    except KeyboardInterrupt:
+        logger.info('Interrupted by user.')
+
+    finally:
+        # turn off the heater:
+        HEATER.turn_off()
+        HEATER.terminate_controller_thread()
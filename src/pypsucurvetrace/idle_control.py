@@ -0,0 +1,446 @@
+"""
+Python classes for the control of the DUT idle / pre-heat periods of curve tracing
+"""
+
+import math
+import time
+from collections import deque
+import numpy as np
+from pypsucurvetrace.curvetrace_tools import get_logger
+
+# set up logger:
+logger = get_logger('idle_control')
+
+
+# thermal_idle_scheduler:
+#    .observe(t, U1, I1, U2, I2, T)   add reading taken at time t (s) during pre-heat (for estimation of the thermal time constant)
+#    .estimate_tau()                  estimate the thermal time constant from the pre-heat readings
+#    .update(P)                       add DUT power P dissipated since the last update (W)
+#    .idle_time()                     idle time required before the next reading (s)
+#    .idle_done(P_idle, t)            idle period of t seconds at DUT power P_idle is done
+#
+# steady_state_detector:
+#    .observe(t, U1, I1, U2, I2, T)   add reading taken at time t (s) during pre-heat, returns True once the DUT operating point is steady
+#    .drift()                         drift rates of I1, U2 and T over the last window (per minute)
+#
+# idle_bias_regulator:
+#    .update(U, I, I_target, I_tol)   add reading I at voltage setpoint U, returns the new voltage setpoint
+#    .interval()                      time to wait before the next reading (s)
+#    .gm()                            estimated transconductance dI/dU (A/V, None if not known yet)
+#    .converged()                     True if the idle current is within tolerance of the target value
+#    .iterations()                    number of updates since the last reset
+#    .reset()                         start new regulation (keep transconductance estimate)
+
+class thermal_idle_scheduler:
+	"""
+	Scheduler of the idle periods between the readings of curve tracing, based on a thermal RC model of the DUT.
+
+	The model tracks the difference x of the DUT power to the idle power, filtered with the thermal time constant tau
+	(x is proportional to the offset of the DUT temperature from the idle temperature). An idle period is only needed if
+	|x| exceeds the tolerance tol x P_idle, i.e. the temperature offset exceeds the fraction tol of the temperature rise at idle.
+	The idle period then lasts just long enough to bring the offset back to half the tolerance (but not longer than t_max).
+	"""
+
+	def __init__(self, tau=None, tol=0.1, t_max=None):
+		'''
+		thermal_idle_scheduler(tau=None, tol=0.1, t_max=None)
+		tau (optional): thermal time constant of the DUT (s). If tau is None, tau needs to be estimated from pre-heat readings.
+		tol (optional): tolerance of the DUT temperature offset from idle, relative to the temperature rise at idle
+		t_max (optional): max. idle time (s), also used as the idle time if the model is not ready (unknown tau or idle power)
+		'''
+
+		self._tau = tau
+		self._tol = tol
+		self._t_max = t_max
+		self._x = 0.0		# DUT power difference to idle power, filtered with tau (W)
+		self._P_idle = None	# DUT power at idle (W)
+		self._t_last = None	# time of last update
+		self._observed = []	# pre-heat readings
+
+
+	def tau(self):
+		return self._tau
+
+
+	def observe(self, t, U1, I1, U2, I2, T):
+		'''
+		thermal_idle_scheduler.observe(t, U1, I1, U2, I2, T)
+
+		Add a reading taken during pre-heat (used to estimate the thermal time constant).
+
+		INPUT:
+		t: time since start of pre-heat (s)
+		U1, I1, U2, I2: PSU voltage and current readings (V, A)
+		T: heaterblock temperature (°C, or None)
+
+		OUTPUT:
+		(none)
+		'''
+		self._observed.append( (t, I1, U2) )
+
+
+	def estimate_tau(self):
+		'''
+		tau = thermal_idle_scheduler.estimate_tau()
+
+		Estimate the thermal time constant from the drift of the pre-heat readings (I1 if the idle bias is fixed, or the regulated U2 otherwise),
+		by fitting an exponential approach to the readings.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		tau: thermal time constant (s), or None if the readings do not show a clear exponential drift
+		'''
+
+		if len(self._observed) < 10:
+			return None
+
+		u = np.array(self._observed)
+		t = u[:,0]
+		span = t[-1] - t[0]
+		if span <= 0.0:
+			return None
+
+		# ignore the start of the pre-heat (regulation of the idle bias):
+		k = t >= t[0] + 0.05*span
+		t = t[k] - t[k][0]
+
+		tau = None
+		best = 0.0
+		for y in [ u[k,1] , u[k,2] ]:
+			if not np.all(np.isfinite(y)):
+				continue
+			for tt in np.logspace( np.log10(max(span/200, 0.1)) , np.log10(3*span) , 80 ):
+				A = np.vstack( [ np.ones(len(t)) , np.exp(-t/tt) ] ).T
+				c, _, _, _ = np.linalg.lstsq(A, y, rcond=None)
+				rms = np.sqrt( np.mean( (y - A.dot(c))**2 ) )
+				q = abs(c[1]) / max(rms, 1E-12) # amplitude of the exponential drift relative to the residual noise
+				if ( q > 5.0 ) and ( q > best ):
+					best = q
+					tau = float(tt)
+
+		if tau is not None:
+			self._tau = tau
+
+		return tau
+
+
+	def update(self, P):
+		'''
+		thermal_idle_scheduler.update(P)
+
+		Add the DUT power dissipated since the last update.
+
+		INPUT:
+		P: DUT power (W)
+
+		OUTPUT:
+		(none)
+		'''
+
+		now = time.time()
+		if ( self._t_last is not None ) and ( self._tau is not None ) and ( self._P_idle is not None ):
+			d = P - self._P_idle
+			self._x = d + (self._x - d) * math.exp( -(now - self._t_last) / self._tau )
+		self._t_last = now
+
+
+	def idle_time(self):
+		'''
+		t = thermal_idle_scheduler.idle_time()
+
+		Idle time required before the next reading.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		t: idle time (s)
+		'''
+
+		if ( self._tau is None ) or ( self._P_idle is None ) or ( self._P_idle <= 0.0 ):
+			return self._t_max
+
+		x_tol = self._tol * self._P_idle
+		if abs(self._x) <= x_tol:
+			return 0.0
+
+		t = self._tau * math.log( abs(self._x) / (0.5*x_tol) )
+		if self._t_max is not None:
+			t = min(t, self._t_max)
+		return t
+
+
+	def idle_done(self, P_idle, t):
+		'''
+		thermal_idle_scheduler.idle_done(P_idle, t)
+
+		Idle period is done.
+
+		INPUT:
+		P_idle: DUT power at the end of the idle period (W)
+		t: duration of the idle period (s)
+
+		OUTPUT:
+		(none)
+		'''
+
+		if self._tau is not None:
+			self._x = self._x * math.exp( -t / self._tau )
+		self._P_idle = P_idle
+		self._t_last = time.time()
+
+
+
+class steady_state_detector:
+	"""
+	Detector of the steady state of the DUT operating point during pre-heat.
+
+	The drift rates of I1, U2 and the heaterblock temperature are determined by linear regression over a sliding window of
+	readings. The operating point is steady once all drift rates stay below their thresholds for the hold time. Since the
+	window needs to be filled first, the pre-heat lasts at least window + hold seconds.
+	"""
+
+	def __init__(self, window=60.0, hold=30.0, drift_I=0.002, drift_U=0.005, drift_T=0.1):
+		'''
+		steady_state_detector(window=60.0, hold=30.0, drift_I=0.002, drift_U=0.005, drift_T=0.1)
+		window (optional): length of the sliding window used to determine the drift rates (s)
+		hold (optional): time the drift rates need to stay below the thresholds (s)
+		drift_I (optional): max. drift rate of I1, relative to the mean I1 value (1/min)
+		drift_U (optional): max. drift rate of U2 (V/min)
+		drift_T (optional): max. drift rate of the heaterblock temperature (K/min)
+		'''
+
+		self._window = window
+		self._hold = hold
+		self._limits = [ drift_I , drift_U , drift_T ]
+		self._readings = deque()	# readings in the window (t, I1, U2, T)
+		self._t_start = None		# time of first reading
+		self._t_ok = None		# time since the drift rates are below the thresholds
+		self._drift = [ None , None , None ]
+
+
+	def observe(self, t, U1, I1, U2, I2, T):
+		'''
+		steady = steady_state_detector.observe(t, U1, I1, U2, I2, T)
+
+		Add a reading taken during pre-heat.
+
+		INPUT:
+		t: time since start of pre-heat (s)
+		U1, I1, U2, I2: PSU voltage and current readings (V, A)
+		T: heaterblock temperature (°C, or None)
+
+		OUTPUT:
+		steady: True if the DUT operating point is steady
+		'''
+
+		if T is None:
+			T = math.nan
+		self._readings.append( (t, abs(I1), U2, T) )
+		if self._t_start is None:
+			self._t_start = t
+		while self._readings[0][0] < t - self._window:
+			self._readings.popleft()
+
+		if t - self._t_start < self._window:
+			return False # window not filled yet
+
+		u = np.array(self._readings)
+		tt = ( u[:,0] - u[-1,0] ) / 60.0 # minutes
+		self._drift = [ None , None , None ]
+		ok = True
+		for k in range(3):
+			y = u[:,k+1]
+			if ( len(y) < 3 ) or not np.all(np.isfinite(y)):
+				continue # no readings (for example, no heaterblock)
+			d = abs( np.polyfit(tt, y, 1)[0] )
+			if k == 0:
+				d = d / max( np.mean(y) , 1E-9 )
+			self._drift[k] = d
+			if d > self._limits[k]:
+				ok = False
+
+		if not ok:
+			self._t_ok = None
+			return False
+		if self._t_ok is None:
+			self._t_ok = t
+		return t - self._t_ok >= self._hold
+
+
+	def drift(self):
+		'''
+		dI, dU, dT = steady_state_detector.drift()
+
+		Drift rates of I1 (relative, 1/min), U2 (V/min) and heaterblock temperature (K/min) over the last window (None if not available).
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		dI, dU, dT: drift rates
+		'''
+		return self._drift
+
+
+
+class idle_bias_regulator:
+	"""
+	Regulator of the idle current of the DUT by adjusting the voltage of the regulating PSU.
+
+	The transconductance gm = dI/dU of the DUT at the idle operating point is estimated online by recursive least squares
+	(with forgetting factor) from the changes of the voltage setpoint and the resulting changes of the idle current. The
+	voltage setpoint is then adjusted by Newton steps using the estimated gm. The update rate is limited: the regulator
+	polls every interval seconds until the idle current is within tolerance, and then slows down to interval_max.
+	"""
+
+	def __init__(self, gm, U_min, U_max, U_res=None, interval=0.25, interval_max=2.0, gain=0.8, forget=0.9, N_converged=3):
+		'''
+		idle_bias_regulator(gm, U_min, U_max, U_res=None, interval=0.25, interval_max=2.0, gain=0.8, forget=0.9, N_converged=3)
+		gm: initial value of the transconductance dI/dU (A/V), or None if unknown (the regulator then probes with small steps in the direction of the target current, assuming gm > 0)
+		U_min, U_max: range of the voltage setpoint (V)
+		U_res (optional): voltage setting resolution of the regulating PSU (V)
+		interval (optional): poll interval during regulation (s)
+		interval_max (optional): max. poll interval after convergence (s)
+		gain (optional): fraction of the Newton step applied at each update
+		forget (optional): forgetting factor of the recursive least squares estimation of gm
+		N_converged (optional): number of consecutive readings within tolerance required for convergence
+		'''
+
+		self._gm0 = gm
+		self._U_min = min(U_min, U_max)
+		self._U_max = max(U_min, U_max)
+		self._U_res = U_res
+		self._interval_min = interval
+		self._interval_max = interval_max
+		self._gain = gain
+		self._forget = forget
+		self._N_converged = N_converged
+
+		self._gm = gm
+		dU_ref = max( (self._U_max-self._U_min) / 100.0 , 1E-3 )
+		self._P_unknown = 1.0 / dU_ref**2	# covariance of the gm estimate if gm is unknown (large)
+		if gm is None:
+			self._P = self._P_unknown
+		else:
+			self._P = 0.1 / dU_ref**2	# covariance of the gm estimate (small, gm known approximately)
+		self.reset()
+
+
+	def reset(self):
+		'''
+		idle_bias_regulator.reset()
+
+		Start new regulation (for example at the start of a new idle period). The gm estimate is kept.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		(none)
+		'''
+
+		self._last = None		# last (U, I) pair
+		self._N_ok = 0			# number of consecutive readings within tolerance
+		self._N = 0			# number of updates
+		self._dt = self._interval_min
+
+
+	def gm(self):
+		return self._gm
+
+
+	def converged(self):
+		return self._N_ok >= self._N_converged
+
+
+	def iterations(self):
+		return self._N
+
+
+	def interval(self):
+		return self._dt
+
+
+	def update(self, U, I, I_target, I_tol):
+		'''
+		U_new = idle_bias_regulator.update(U, I, I_target, I_tol)
+
+		Add a reading of the idle current and determine the new voltage setpoint.
+
+		INPUT:
+		U: voltage setpoint at the regulating PSU at the time of the reading (V)
+		I: idle current reading (A)
+		I_target: target value of the idle current (A)
+		I_tol: tolerance of the idle current (A), also used as the noise level of the current readings
+
+		OUTPUT:
+		U_new: new voltage setpoint (V)
+		'''
+
+		self._N += 1
+
+		# update gm estimate (only if the voltage change is large enough to get a clear current response):
+		if self._last is not None:
+			dU = U - self._last[0]
+			dI = I - self._last[1]
+			if ( dU != 0.0 ) and ( self._gm_unknown(I_tol) or ( abs(self._gm*dU) > 2*I_tol ) ):
+				gm = self._gm
+				if gm is None:
+					gm = 0.0
+				K = self._P * dU / ( self._forget + dU*self._P*dU )
+				gm = gm + K * ( dI - gm*dU )
+				self._P = ( self._P - K*dU*self._P ) / self._forget
+				self._gm = self._limit_gm(gm)
+				if self._gm_unknown(I_tol):
+					# no current response (e.g. DUT below threshold): gm is unknown, start over with a fresh estimate:
+					self._gm = None
+					self._P = self._P_unknown
+		self._last = (U, I)
+
+		# the idle current can't be set more precisely than the current step resulting from the voltage setting resolution:
+		if self._U_res and self._gm:
+			I_tol = max( I_tol , abs(self._gm)*self._U_res )
+
+		# check convergence, adjust poll interval:
+		err = I - I_target
+		if abs(err) <= I_tol:
+			self._N_ok += 1
+		else:
+			self._N_ok = 0
+		if self.converged():
+			self._dt = min( 2*self._dt , self._interval_max )
+		else:
+			self._dt = self._interval_min
+
+		if abs(err) <= I_tol:
+			return U # within tolerance, don't touch the setpoint
+
+		# determine new setpoint:
+		if self._gm_unknown(I_tol):
+			# gm unknown: probing step in the direction of the target current (assuming gm > 0), stay at the limit of the setpoint range if the target can't be reached:
+			dU = -math.copysign( 0.02 * (self._U_max - self._U_min) , err )
+		else:
+			dU = -self._gain * err / self._gm
+			dU = max( min( dU , 0.25*(self._U_max-self._U_min) ) , -0.25*(self._U_max-self._U_min) ) # limit step size
+		U = max( min( U + dU , self._U_max ) , self._U_min )
+		if self._U_res:
+			U = round(U/self._U_res) * self._U_res
+		return U
+
+
+	def _gm_unknown(self, I_tol):
+		# gm is unknown if there is no estimate, or if the estimate is so small that no current change beyond the tolerance is expected over the full setpoint range:
+		return ( self._gm is None ) or ( abs(self._gm)*(self._U_max-self._U_min) <= I_tol )
+
+
+	def _limit_gm(self, gm):
+		# keep the gm estimate within a factor of 10 of the initial value (sign and order of magnitude), to avoid run-away estimates from noisy readings:
+		if self._gm0 is None:
+			return gm
+		g = abs(self._gm0)
+		if gm * self._gm0 <= 0.0:
+			return self._gm0 / 10.0
+		return math.copysign( min( max( abs(gm) , g/10.0 ) , 10.0*g ) , self._gm0 )
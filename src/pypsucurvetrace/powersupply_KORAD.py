@@ -32,6 +32,11 @@ KORAD_SPECS = {
 
 KORAD_TIMEOUT = 2.0
 
+# fast transport mode (see KORAD class):
+KORAD_FAST_GAP = 0.05		# max. gap between bytes of a reply (s), a reply without line terminator is complete after this gap
+KORAD_FAST_ATTEMPTS = 3		# max. number of attempts for each command
+KORAD_FAST_CMD_GAP = 0.05	# min. time after a set command (no reply) before the next command is sent (s), KORADs tend to drop commands sent without a pause
+
 def _KORAD_debug(s):
 	sys.stdout.write(s)
 	sys.stdout.flush()
@@ -60,12 +65,19 @@ class KORAD(object):
 	Class for KORAD (RND) power supply
 	"""
 
-	def __init__(self, port, debug=False,):
+	def __init__(self, port, debug=False, fast=False):
 		'''
 		PSU(port)
 		port : serial port (string, example: port = '/dev/serial/by-id/XYZ_123_abc')
 		debug: flag for debugging info (bool)
+		fast: use fast transport mode (bool). The default (conservative) transport mode clears the serial buffers and waits a bit before each command, and waits for the full timeout if a reply has no line terminator.
+			The fast mode sends queries right away (set commands only after a short pause since the previous set command, since set commands are not acknowledged), frames the replies by line terminator or by a gap after the last byte received, and clears the serial buffers only after communication errors.
 		'''
+		# transport mode:
+		self._fast = bool(fast)
+		self._error = False # flag indicating a communication error with the last command (fast mode)
+		self._t_set = None # time of the last set command without reply (fast mode)
+
 		# open and configure serial port:
 		baud = 9600
 		from pkg_resources import parse_version
@@ -79,6 +91,9 @@ class KORAD(object):
 
 		time.sleep(0.2) # wait a bit unit the port is really ready
 
+		if self._fast:
+			self._Serial.timeout = KORAD_FAST_GAP
+
 		self._Serial.flushInput()
 		self._Serial.flushOutput()
 		self._debug = bool(debug)
@@ -136,11 +151,14 @@ class KORAD(object):
 		tx/rx to/from PS
 		"""
 
+		if self._fast:
+			return self._query_fast(cmd, answer)
+
 		if attempt > 10:
 			raise RuntimeError('KORAD PSU does not respond to ' + cmd + ' command after 10 attempts. Giving up...')
 		elif attempt > 1:
 			if self._debug:
-				_pps_debug('*** Retrying (attempt ' + str(attempt) + ')...')
+				_KORAD_debug('*** Retrying (attempt ' + str(attempt) + ')...')
 
 		# just in case, make sure the buffers are empty before doing anything:
 		# (it seems some KORADs tend to have issues with stuff dangling in their serial buffers)
@@ -166,6 +184,89 @@ class KORAD(object):
 
 		return ans
 
+	def _query_fast(self, cmd, answer=True):
+		"""
+		tx/rx to/from PS (fast transport mode)
+		"""
+
+		for attempt in range(1, KORAD_FAST_ATTEMPTS+1):
+
+			if self._error:
+				# clean the pipes after a communication error (there may be a late or partial reply dangling in the buffers):
+				if self._debug: _KORAD_debug('*** Retrying (attempt ' + str(attempt) + ')...\n')
+				self._Serial.reset_output_buffer()
+				self._Serial.reset_input_buffer()
+				time.sleep(0.03)
+				self._error = False
+
+			# pause after a set command (the PSU does not acknowledge set commands, make sure it had time to process the last one):
+			if self._t_set is not None:
+				dt = KORAD_FAST_CMD_GAP - ( time.monotonic() - self._t_set )
+				if dt > 0.0:
+					time.sleep(dt)
+				self._t_set = None
+
+			if self._debug: _KORAD_debug('KORAD <- %s\n' % cmd)
+			self._Serial.write((cmd + '\n').encode())
+
+			if not answer:
+				self._t_set = time.monotonic()
+				return None
+
+			# read answer until line terminator, or until there is a gap after the last byte (replies without terminator), or until the deadline:
+			ans = b''
+			deadline = time.time() + KORAD_TIMEOUT
+			while time.time() < deadline:
+				b = self._Serial.read(max(1, self._Serial.in_waiting))
+				if b:
+					ans += b
+					if b'\n' in ans:
+						break
+				elif len(ans) > 0:
+					break
+			try:
+				# strict decoding: a corrupted reply (e.g. a garbled STATUS byte) is a failed attempt, not a valid answer
+				ans = ans.decode('utf-8').rstrip("\n\r")
+			except UnicodeDecodeError:
+				if self._debug: _KORAD_debug('KORAD -> %s (corrupted reply)\n' % repr(ans))
+				ans = ''
+			else:
+				if self._debug: _KORAD_debug('KORAD -> %s\n' % ans)
+
+			if ans != '':
+				return ans
+
+			self._error = True
+
+		raise RuntimeError('KORAD PSU does not respond to ' + cmd + ' command after ' + str(KORAD_FAST_ATTEMPTS) + ' attempts. Giving up...')
+
+
+	def _query_retry(self, cmd, what, convert):
+		"""
+		query value from PS, retry up to 10 times if the answer can't be converted to a valid value
+		"""
+		for k in range(10):
+			try:
+				return convert(self._query(cmd))
+			except:
+				self._error = True
+				if not self._fast:
+					self._Serial.reset_output_buffer()
+					self._Serial.reset_input_buffer()
+					time.sleep(0.05)
+		raise RuntimeError('Could not read ' + what + ' from KORAD PSU!')
+
+
+	def _status_mode(self, status):
+		"""
+		convert answer to STATUS? query to 'CV' or 'CC'
+		"""
+		if status.encode()[0] & 0b00000001: # test bit-1 for CV or CC
+			return 'CV'
+		else:
+			return 'CC'
+
+
 	def output(self, state):
 		"""
 		enable/disable the PS output
@@ -202,7 +303,8 @@ class KORAD(object):
 		if current < 0.0:
 			current = 0.0
 		current = round (1000*current) / 1000
-		self._query('ISET:' + str(current),answer=False)
+		if not self._fast:
+			self._query('ISET:' + str(current),answer=False)
 		if self.MODEL == "KWR103":
 			self._query('ISET:' + str(current),answer=False)
 		else:
@@ -221,53 +323,8 @@ class KORAD(object):
 			Vq = 'VOUT1?'
 			Iq = 'IOUT1?'
 
-		# read voltage:
-		k = 1
-		while True:
-			try:
-				if k > 10:
-					raise RuntimeException("Could not read voltage from KORAD PSU!")
-				V = float (self._query(Vq))
-				break
-			except:
-				k = k+1
-				self._Serial.reset_output_buffer()
-				self._Serial.reset_input_buffer()
-				time.sleep(0.05)
-				pass
-
-		# read current:
-		k = 1
-		while True:
-			try:
-				if k > 10:
-					raise RuntimeException("Could not read current from KORAD PSU!")
-				I = float (self._query(Iq))
-				break
-			except:
-				k = k+1
-				self._Serial.reset_output_buffer()
-				self._Serial.reset_input_buffer()
-				time.sleep(0.05)
-				pass
-
-		# read output limit status:
-		k = 1
-		while True:
-			try:
-				if k > 10:
-					raise RuntimeException("Could not read output limit status from KORAD PSU!")
-				S = self._query('STATUS?')
-				if S.encode()[0] & 0b00000001: # test bit-1 for CV or CC
-					S = 'CV'
-				else:
-					S = 'CC'
-				break
-			except:
-				k = k+1
-				self._Serial.reset_output_buffer()
-				self._Serial.reset_input_buffer()
-				time.sleep(0.05)
-				pass
+		V = self._query_retry(Vq, 'voltage', float)
+		I = self._query_retry(Iq, 'current', float)
+		S = self._query_retry('STATUS?', 'output limit status', self._status_mode)
 
 		return (V, I, S)
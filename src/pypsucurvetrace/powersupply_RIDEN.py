@@ -53,16 +53,19 @@ class RIDEN(object):
 	Class for RIDEN (RUIDEN) power supply
 	"""
 
-	def __init__(self, port, baud=115200, currentmode = 'LOW', debug=False):
+	def __init__(self, port, baud=115200, currentmode = 'LOW', readback=False, debug=False):
 		'''
 		PSU(port)
 		port : serial port (string, example: port = '/dev/serial/by-id/XYZ_123_abc')
 		baud : baud rate of serial port (check the settings at the RD PSU unit)
 		currentmode: use 'LOW' or 'HIGH' to configure PSU units to use low/high current modes (with corresponding current resolution) [only for units that support this, like the 6012P]
+		readback: read the output values after each voltage setting (bool, not needed with the supported models, costs an extra Modbus transaction per voltage step)
 		debug: flag for debugging info (bool)
 		'''
 		
 		self._debug = bool(debug)
+		self._readback = bool(readback)
+		self._protection = 0 # last value of the protection status register
 		
 		# open and configure ModBus/serial port:
 		try:
@@ -222,7 +225,8 @@ class RIDEN(object):
 		
 		## time.sleep(0.5)
 		
-		u = self.reading()
+		if self._readback:
+			u = self.reading()
 		
 
 	def current(self, current):
@@ -243,15 +247,23 @@ class RIDEN(object):
 		read applied output voltage and current and if PS is in "CV" or "CC" mode
 		"""
 		
-		# read voltage and current registers:
+		# read registers 10...17 in one go (10: voltage, 11: current, 12-13: power, 14: input voltage, 15: keypad lock, 16: protection status, 17: CV/CC status):
 		V_mult = self._voltage_multiplier()
 		I_mult = self._current_multiplier()
-		u = self._get_N_registers(10,2)
+		u = self._get_N_registers(10,8)
 		V = u[0] / V_mult
 		I = u[1] / I_mult
         
+		# check protection status (register 16: 0 = OK, 1 = OVP, 2 = OCP):
+		if u[6] != self._protection:
+		    self._protection = u[6]
+		    if u[6] == 1:
+		        logger.warning ( 'RIDEN ' + self.MODEL + ' over-voltage protection (OVP) tripped!' )
+		    elif u[6] == 2:
+		        logger.warning ( 'RIDEN ' + self.MODEL + ' over-current protection (OCP) tripped!' )
+
 		# check register 17 (CV or CC?)
-		if self._get_register(17) == 1:
+		if u[7] == 1:
 		    S = 'CC'
 		else:
 		    S = 'CV'
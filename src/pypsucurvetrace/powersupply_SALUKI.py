@@ -6,7 +6,7 @@ import serial
 import sys
 import time
 from math import ceil, log10
-from pypsucurvetrace.curvetrace_tools import get_logger
+from pypsucurvetrace.curvetrace_tools import get_logger, read_cache, update_cache
 
 # set up logger:
 logger = get_logger('powersupply_SALUKI')
@@ -23,6 +23,9 @@ SALUKI_SPECS = {
 
 SALUKI_TIMEOUT = 2.0
 
+# cache file with baud rates of successful connections (per serial port):
+SALUKI_BAUD_CACHE = 'PSU_baud_rates.json'
+
 def _SALUKI_debug(s):
 	sys.stdout.write(s)
 	sys.stdout.flush()
@@ -44,37 +47,50 @@ def _SALUKI_debug(s):
 #    .MAXSETTLETIME
 #    .READIDLETIME
 #    .MODEL
+#    .SERIALNUMBER
 
 class SALUKI(object):
 	"""
 	Class for SALUKI power supply.
 	"""
 
-	def __init__(self, port, debug=False):
+	def __init__(self, port, debug=False, baud=None):
 		'''
 		PSU(port)
 		port : serial port (string, example: port = '/dev/serial/by-id/XYZ_123_abc')
 		debug: flag for debugging info (bool)
+		baud: baud rate of the serial port (int). If not specified, the baud rates supported by the PSU are tried one by one, starting with the baud rate of the last successful connection at this port
 		'''
 
 		self.MODEL = '?'
+		self.SERIALNUMBER = None
+		self._COMPOUND_READ = None # support of compound SCPI queries for readings (None = unknown)
+		self._COMPOUND_PROBES = { 'failed': 0, 'rejected': 0 } # failed probes for compound query support (total, and answers with wrong number of fields)
 
 		# open and configure serial port:
-		baud_rates = ( 9600, 57600, 38400, 19200, 14400, 4800 )
+		if baud:
+			# use the specified baud rate only:
+			baud_rates = ( int(baud), )
+		else:
+			baud_rates = ( 9600, 57600, 38400, 19200, 14400, 4800 )
+			# try the baud rate of the last successful connection first:
+			u = read_cache(SALUKI_BAUD_CACHE).get(port)
+			if u in baud_rates:
+				baud_rates = ( u, ) + tuple( b for b in baud_rates if b != u )
 		
 		from pkg_resources import parse_version
 		typestring = None
-		for baud in baud_rates:
+		for b in baud_rates:
 
 			try:
 			
 				if parse_version(serial.__version__) >= parse_version('3.3') :
 					# open port with exclusive access:
-					self._Serial = serial.Serial(port, baudrate=baud, bytesize=8, parity='N', stopbits=1, timeout=SALUKI_TIMEOUT, exclusive = True)
+					self._Serial = serial.Serial(port, baudrate=b, bytesize=8, parity='N', stopbits=1, timeout=SALUKI_TIMEOUT, exclusive = True)
 
 				else:
 					# open port (can't ask for exclusive access):
-					self._Serial = serial.Serial(port, baudrate=baud, bytesize=8, parity='N', stopbits=1, timeout=SALUKI_TIMEOUT)
+					self._Serial = serial.Serial(port, baudrate=b, bytesize=8, parity='N', stopbits=1, timeout=SALUKI_TIMEOUT)
 
 				time.sleep(0.2) # wait a bit unit the port is really ready
 				
@@ -96,6 +112,10 @@ class SALUKI(object):
 
 		if typestring is None:
 			raise RuntimeError('Could not connect to SALUKI power supply.')
+
+		# remember the baud rate for the next connection:
+		if not baud:
+			update_cache(SALUKI_BAUD_CACHE, port, b)
 				
 		try:		
 			# parse typestring:
@@ -130,6 +150,10 @@ class SALUKI(object):
 				logger.warning ( 'Unknown SALUKI model: ' + typestring[1] )
 				self.MODEL = '?????'
 
+			# serial number (if reported):
+			if len(typestring) > 2:
+				self.SERIALNUMBER = typestring[2].strip()
+
 			v = SALUKI_SPECS[self.MODEL]
 			self.VMIN = v[0]
 			self.VMAX = v[1]
@@ -198,6 +222,53 @@ class SALUKI(object):
 		return ans
 		
 
+	def _query_retry(self, cmd, what, convert):
+		"""
+		query value from PS, retry up to 10 times if the answer can't be converted to a valid value
+		"""
+		for k in range(10):
+			try:
+				return convert(self._query(cmd))
+			except:
+				self._Serial.reset_output_buffer()
+				self._Serial.reset_input_buffer()
+				time.sleep(0.05)
+		raise RuntimeError('Could not read ' + what + ' from SALUKI PSU!')
+
+
+	def _reading_compound(self):
+		"""
+		read voltage and current with a single compound SCPI query (one round trip)
+		returns None if not successful (compound queries not supported, or communication error)
+		"""
+		if self._COMPOUND_READ is None:
+			max_attempts = 1 # probe for compound query support, don't try too hard
+		else:
+			max_attempts = 3
+		rejected = False # PSU answered, but with the wrong number of fields
+		try:
+			u = self._query('*CLS;:MEASURE:VOLTAGE?;:MEASURE:CURRENT?', max_attempts = max_attempts).split(';')
+			if len(u) != 2:
+				rejected = True
+				raise ValueError('Unexpected answer to compound query: ' + ';'.join(u))
+			u = ( float(u[0]) , float(u[1]) )
+		except:
+			self._Serial.reset_output_buffer()
+			self._Serial.reset_input_buffer()
+			if self._COMPOUND_READ is None:
+				# don't conclude from a single failed probe, the answer may have been lost or garbled on the line.
+				# compound queries are not supported if the PSU answers with the wrong number of fields again, or if the probe keeps failing:
+				self._COMPOUND_PROBES['failed'] += 1
+				if rejected:
+					self._COMPOUND_PROBES['rejected'] += 1
+				if ( self._COMPOUND_PROBES['rejected'] >= 2 ) or ( self._COMPOUND_PROBES['failed'] >= 3 ):
+					logger.info ('SALUKI ' + self.MODEL + ' does not support compound queries, reading values one by one...')
+					self._COMPOUND_READ = False
+			return None
+		self._COMPOUND_READ = True
+		return u
+
+
 	def output(self, state):
 		"""
 		enable/disable the PS output
@@ -266,37 +337,18 @@ class SALUKI(object):
 		read applied output voltage and current and if PS is in "CV" or "CC" mode
 		"""
 		
-		self._query('*CLS', answer=False)
-		
-		# read voltage:
-		k = 1
-		while True:
-			try:
-				if k > 10:
-					raise RuntimeException("Could not read voltage from SALUKI PSU!")
-				V = float (self._query('MEASURE:VOLTAGE?'))
-				break
-			except:
-				k = k+1
-				self._Serial.reset_output_buffer()
-				self._Serial.reset_input_buffer()
-				time.sleep(0.05)
-				pass
-
-		# read current:
-		k = 1
-		while True:
-			try:
-				if k > 10:
-					raise RuntimeException("Could not read current from SALUKI PSU!")
-				I = float (self._query('MEASURE:CURRENT?'))
-				break
-			except:
-				k = k+1
-				self._Serial.reset_output_buffer()
-				self._Serial.reset_input_buffer()
-				time.sleep(0.05)
-				pass
+		V = None
+		if self._COMPOUND_READ is not False:
+			# try reading all values with a single compound query:
+			u = self._reading_compound()
+			if u is not None:
+				V, I = u[0], u[1]
+
+		if V is None:
+			# read values one by one:
+			self._query('*CLS', answer=False)
+			V = self._query_retry('MEASURE:VOLTAGE?', 'voltage', float)
+			I = self._query_retry('MEASURE:CURRENT?', 'current', float)
 
 		# determine / guess output limit status:
 		# (see email from sales01@salukitec.com 20 March 2023: The internal judgment standard of the instrument is that if the difference between the actual current and the current setting value is within 1mA, it will display CC (constant current); if the difference between the actual voltage and the voltage setting value is within 5mV, it will display CV (constant voltage). Errors are all exceeded, nothing is displayed (neither CV nor CC are displayed)
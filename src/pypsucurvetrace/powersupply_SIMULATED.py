@@ -0,0 +1,384 @@
+"""
+Python class for simulated power supplies connected to a simulated device under test (DUT)
+(no hardware required, useful for testing and benchmarking of the curvetrace program)
+"""
+
+# The "port" of a simulated PSU specifies the DUT model, the DUT terminal the PSU is connected to,
+# and (optionally) the properties of the simulated PSU unit:
+#
+#    <DUT>[(<par>=<value>,...)]:<terminal>[:<option>=<value>,...]
+#
+# Examples:
+#    PSU1: COMPORT = MOSFET(VTH=3.5,K=0.8):1
+#    PSU2: COMPORT = MOSFET(VTH=3.5,K=0.8):2:LATENCY=0.01,NOISE=1.0
+#
+# PSU1 is connected to terminal 1 of the DUT (drain / collector / anode), PSU2 to terminal 2 (gate / base / grid).
+# PSUs with identical DUT strings share the same DUT object.
+#
+# DUT models and their parameters (default values in brackets):
+#    RESISTOR: R [100 Ohm] between terminal 1 and ground; R2 [none] between terminal 2 and ground
+#    MOSFET:   square-law n-channel MOSFET, U1 = drain, U2 = gate; VTH [3.0 V], K [0.5 A/V^2], LAMBDA [0.01 1/V]
+#    JFET:     square-law n-channel JFET, U1 = drain, U2 = negative gate voltage (PSU2 with inverted polarity); IDSS [0.01 A], VP [2.0 V], LAMBDA [0.01 1/V]
+#    BJT:      NPN BJT with base resistor R2CONTROL, U1 = collector, U2 = control voltage at R2CONTROL; BETA [200], VBE [0.65 V], R2CONTROL [100E3 Ohm], VA [100 V], VCESAT [0.2 V]
+#    TRIODE:   vacuum triode (three-halves power law), U1 = anode, U2 = negative grid voltage (PSU2 with inverted polarity); K [1E-5 A/V^1.5], MU [20]
+#
+# Options of the simulated PSU unit (default values in brackets):
+#    MODEL:   PSU model as in SIMULATED_SPECS [SIM30V]
+#    LATENCY: time required to process each command (s) [0.0]
+#    NOISE:   standard deviation of the reading noise (in units of the PSU read resolution) [0.5]
+#    TAU:     time constant of the PSU output response to setpoint changes (s) [0.05]
+
+import math
+import random
+import re
+import threading
+import time
+from pypsucurvetrace.curvetrace_tools import get_logger
+
+# set up logger:
+logger = get_logger('powersupply_SIMULATED')
+
+
+# Python dictionary of simulated power supply models (Vmin,Vmax,Imax,Pmax,VresolutionSet,IresolutionSet,VresolutionRead,IresolutionRead,VoffsetMax,IoffsetMax,MaxSettleTime)
+SIMULATED_SPECS = {
+		"SIM30V":	( 0.0,  30.0, 5.0,  150, 0.01,  0.001,   0.01,  0.001,   0.0, 0.0, 2.0 ) , # similar to KORAD KA3005P
+		"SIM60V":	( 0.0,  60.0, 6.0,  360, 0.001, 0.0001,  0.001, 0.0001,  0.0, 0.0, 1.5 ) , # similar to RIDEN RD6006P
+		"SIM600V":	( 0.0, 610.0, 0.35, 210, 0.02,  0.00001, 0.3,   0.00001, 0.02, 0.0001, 2.0 ) , # similar to B&K 9185B
+}
+
+# default parameters of the DUT models:
+SIMULATED_DUTS = {
+		"RESISTOR":	{ 'R': 100.0, 'R2': None },
+		"MOSFET":	{ 'VTH': 3.0, 'K': 0.5, 'LAMBDA': 0.01 },
+		"JFET":		{ 'IDSS': 0.01, 'VP': 2.0, 'LAMBDA': 0.01 },
+		"BJT":		{ 'BETA': 200.0, 'VBE': 0.65, 'R2CONTROL': 100E3, 'VA': 100.0, 'VCESAT': 0.2 },
+		"TRIODE":	{ 'K': 1E-5, 'MU': 20.0 },
+}
+
+# DUT objects (shared by all simulated PSUs using the same DUT string):
+_DUT_REGISTRY = {}
+_DUT_REGISTRY_LOCK = threading.Lock()
+
+
+def _parse_parameters(s):
+	# convert string "A=1,B=2" to dictionary { 'A': '1', 'B': '2' }
+	par = {}
+	for item in s.split(','):
+		if item.strip() == '':
+			continue
+		if not '=' in item:
+			raise ValueError('Could not parse parameter ' + item + ' (format is not <name>=<value>).')
+		name, value = item.split('=', 1)
+		par[name.strip().upper()] = value.strip()
+	return par
+
+
+def get_simulated_DUT(spec):
+	'''
+	get_simulated_DUT(spec)
+
+	Return the simulated DUT object described by the DUT string spec (e.g., 'MOSFET(VTH=3.5)'). The DUT object is created if it does not exist yet.
+	'''
+
+	spec = spec.strip()
+	with _DUT_REGISTRY_LOCK:
+		if not spec in _DUT_REGISTRY:
+			m = re.match(r'^(\w+)\s*(?:\((.*)\))?$', spec)
+			if m is None:
+				raise ValueError('Could not parse DUT specification ' + spec + '.')
+			_DUT_REGISTRY[spec] = simulated_DUT(m.group(1), _parse_parameters(m.group(2) or ''))
+		return _DUT_REGISTRY[spec]
+
+
+class simulated_DUT(object):
+	"""
+	Class for a simulated DUT with two terminals connected to (simulated) PSU1 and PSU2
+	"""
+
+	def __init__(self, model, parameters=None):
+		'''
+		simulated_DUT(model, parameters)
+		model: DUT model (string, see SIMULATED_DUTS)
+		parameters: model parameters (dictionary of strings or floats, missing values are taken from SIMULATED_DUTS)
+		'''
+
+		self.MODEL = model.upper()
+		if not self.MODEL in SIMULATED_DUTS:
+			raise RuntimeError('Unknown DUT model ' + model + ' for simulated PSU.')
+
+		self._par = dict(SIMULATED_DUTS[self.MODEL])
+		if parameters is not None:
+			for name in parameters:
+				if not name in self._par:
+					raise RuntimeError('Unknown parameter ' + name + ' for simulated ' + self.MODEL + '.')
+				self._par[name] = float(parameters[name])
+
+		# state of the PSU outputs at terminals 1 and 2 (output on/off, voltage and current setpoints, actual output voltage and current, CC mode, time of last update):
+		self._on    = [ False, False ]
+		self._V_set = [ 0.0, 0.0 ]
+		self._I_set = [ 0.0, 0.0 ]
+		self._TAU   = [ 0.0, 0.0 ]
+		self._U     = [ 0.0, 0.0 ]
+		self._I     = [ 0.0, 0.0 ]
+		self._CC    = [ False, False ]
+		self._t     = time.time()
+
+		self._lock = threading.RLock()
+
+
+	def currents(self, U1, U2):
+		"""
+		DUT currents (I1, I2) at terminal voltages U1 and U2
+		"""
+
+		p = self._par
+		U1 = max(U1, 0.0)
+		U2 = max(U2, 0.0)
+
+		if self.MODEL == 'RESISTOR':
+			I1 = U1 / p['R']
+			I2 = 0.0 if p['R2'] is None else U2 / p['R2']
+
+		elif self.MODEL == 'MOSFET':
+			Vov = U2 - p['VTH']
+			if Vov <= 0.0:
+				I1 = 0.0
+			elif U1 < Vov:
+				I1 = p['K'] * (2*Vov*U1 - U1**2) * (1 + p['LAMBDA']*U1) # triode region
+			else:
+				I1 = p['K'] * Vov**2 * (1 + p['LAMBDA']*U1) # saturation region
+			I2 = 0.0
+
+		elif self.MODEL == 'JFET':
+			Vov = p['VP'] - U2
+			if Vov <= 0.0:
+				I1 = 0.0
+			elif U1 < Vov:
+				I1 = p['IDSS'] / p['VP']**2 * (2*Vov*U1 - U1**2) * (1 + p['LAMBDA']*U1) # triode region
+			else:
+				I1 = p['IDSS'] / p['VP']**2 * Vov**2 * (1 + p['LAMBDA']*U1) # saturation region
+			I2 = 0.0
+
+		elif self.MODEL == 'BJT':
+			I2 = max( (U2 - p['VBE']) / p['R2CONTROL'] , 0.0 )
+			I1 = p['BETA'] * I2 * (1 + U1/p['VA']) * (1 - math.exp(-U1/p['VCESAT']))
+
+		elif self.MODEL == 'TRIODE':
+			I1 = p['K'] * max(U1 - p['MU']*U2, 0.0)**1.5
+			I2 = 0.0
+
+		return I1, I2
+
+
+	def connect(self, terminal, tau):
+		"""
+		connect (simulated) PSU to DUT terminal (1 or 2) with output time constant tau (s)
+		"""
+		with self._lock:
+			self._TAU[terminal-1] = tau
+
+
+	def set_output(self, terminal, on=None, voltage=None, current=None):
+		"""
+		change output state and/or setpoints of the PSU at DUT terminal (1 or 2)
+		"""
+		with self._lock:
+			self._update()
+			k = terminal - 1
+			if on is not None:
+				self._on[k] = bool(on)
+			if voltage is not None:
+				self._V_set[k] = voltage
+			if current is not None:
+				self._I_set[k] = current
+
+
+	def get_output(self, terminal):
+		"""
+		return actual output voltage, current and CC flag of the PSU at DUT terminal (1 or 2)
+		"""
+		with self._lock:
+			self._update()
+			k = terminal - 1
+			return self._U[k], self._I[k], self._CC[k]
+
+
+	def _target_voltage(self, k, U):
+		# determine the steady-state output voltage of PSU k, given the actual voltages U at both terminals (CV or CC mode):
+		if not self._on[k]:
+			return 0.0, False
+
+		def I_k(u):
+			UU = list(U)
+			UU[k] = u
+			return self.currents(UU[0], UU[1])[k]
+
+		V = self._V_set[k]
+		if I_k(V) <= self._I_set[k]:
+			return V, False # CV mode
+
+		# CC mode: find the voltage where the DUT current is equal to the current limit (bisection):
+		lo = 0.0
+		hi = V
+		for i in range(40):
+			mid = (lo+hi) / 2
+			if I_k(mid) > self._I_set[k]:
+				hi = mid
+			else:
+				lo = mid
+		return lo, True
+
+
+	def _update(self):
+		# advance the PSU outputs towards their steady-state values:
+		now = time.time()
+		dt = now - self._t
+		self._t = now
+		for k in (1, 0): # control terminal first
+			U_target, self._CC[k] = self._target_voltage(k, self._U)
+			if self._TAU[k] > 0.0:
+				self._U[k] = U_target + (self._U[k]-U_target) * math.exp(-dt/self._TAU[k])
+			else:
+				self._U[k] = U_target
+		I = self.currents(self._U[0], self._U[1])
+		for k in (0, 1):
+			if self._on[k]:
+				self._I[k] = min(I[k], self._I_set[k])
+			else:
+				self._I[k] = 0.0
+
+
+# SIMULATED:
+#    .output(state)
+#    .voltage(voltage)
+#    .current(current)
+#    .reading()
+#    .VMIN
+#    .VMAX
+#    .IMAX
+#    .VRESSET
+#    .IRESSET
+#    .VRESREAD
+#    .IRESREAD
+#    .VOFFSETMAX
+#    .IOFFSETMAX
+#    .MAXSETTLETIME
+#    .READIDLETIME
+#    .MODEL
+
+class SIMULATED(object):
+	"""
+	Class for simulated power supply
+	"""
+
+	def __init__(self, port, debug=False):
+		'''
+		PSU(port)
+		port : DUT model, DUT terminal and PSU options (string, example: port = 'MOSFET(VTH=3.5):1:LATENCY=0.01', see above)
+		debug: flag for debugging info (bool)
+		'''
+
+		self._debug = bool(debug)
+
+		u = port.split(':')
+		if len(u) < 2:
+			raise RuntimeError('Invalid port ' + port + ' for simulated PSU (format is <DUT>:<terminal>[:<options>]).')
+		try:
+			self._terminal = int(u[1])
+		except ValueError:
+			raise RuntimeError('Invalid DUT terminal ' + u[1] + ' for simulated PSU.')
+		if not self._terminal in (1, 2):
+			raise RuntimeError('Invalid DUT terminal ' + u[1] + ' for simulated PSU (must be 1 or 2).')
+
+		options = { 'MODEL': 'SIM30V', 'LATENCY': 0.0, 'NOISE': 0.5, 'TAU': 0.05 }
+		if len(u) > 2:
+			options.update(_parse_parameters(':'.join(u[2:])))
+
+		self.MODEL = options['MODEL'].upper()
+		try:
+			v = SIMULATED_SPECS[self.MODEL]
+		except KeyError:
+			raise RuntimeError('Unknown simulated PSU model ' + self.MODEL)
+		self.VMIN = v[0]
+		self.VMAX = v[1]
+		self.IMAX = v[2]
+		self.PMAX = v[3]
+		self.VRESSET = v[4]
+		self.IRESSET = v[5]
+		self.VRESREAD = v[6]
+		self.IRESREAD = v[7]
+		self.VOFFSETMAX = v[8]
+		self.IOFFSETMAX = v[9]
+		self.MAXSETTLETIME = v[10]
+		self.READIDLETIME = self.MAXSETTLETIME/50
+
+		self._latency = float(options['LATENCY'])
+		self._noise = float(options['NOISE'])
+
+		self._DUT = get_simulated_DUT(u[0])
+		self._DUT.connect(self._terminal, float(options['TAU']))
+
+		logger.info('Simulated ' + self.MODEL + ' power supply connected to terminal ' + str(self._terminal) + ' of simulated ' + self._DUT.MODEL + '.')
+
+
+	def _command(self, cmd):
+		# simulate the time required to process a command:
+		if self._debug:
+			logger.debug('SIMULATED <- ' + cmd)
+		if self._latency > 0.0:
+			time.sleep(self._latency)
+
+
+	def output(self, state):
+		"""
+		enable/disable the PS output
+		"""
+		self._command('OUTPUT ' + str(int(bool(state))))
+		self._DUT.set_output(self._terminal, on=bool(state))
+
+
+	def voltage(self, voltage):
+		"""
+		set voltage: silently saturates at VMIN and VMAX
+		"""
+		if voltage > self.VMAX:
+			voltage = self.VMAX
+		if voltage < self.VMIN:
+			voltage = self.VMIN
+		voltage = round(voltage/self.VRESSET) * self.VRESSET
+		self._command('VOLTAGE ' + str(voltage))
+		self._DUT.set_output(self._terminal, voltage=voltage)
+
+
+	def current(self, current):
+		"""
+		set current: silently saturates at 0 and IMAX
+		"""
+		if current > self.IMAX:
+			current = self.IMAX
+		if current < 0.0:
+			current = 0.0
+		current = round(current/self.IRESSET) * self.IRESSET
+		self._command('CURRENT ' + str(current))
+		self._DUT.set_output(self._terminal, current=current)
+
+
+	def reading(self):
+		"""
+		read applied output voltage and current and if PS is in "CV" or "CC" mode
+		"""
+		self._command('READ')
+		U, I, CC = self._DUT.get_output(self._terminal)
+
+		# add noise and quantize to the read resolution:
+		U = round( (U + random.gauss(0.0, self._noise*self.VRESREAD)) / self.VRESREAD ) * self.VRESREAD
+		I = round( (I + random.gauss(0.0, self._noise*self.IRESREAD)) / self.IRESREAD ) * self.IRESREAD
+		U = max(U, 0.0)
+		I = max(I, 0.0)
+
+		if CC:
+			S = 'CC'
+		else:
+			S = 'CV'
+
+		return (U, I, S)
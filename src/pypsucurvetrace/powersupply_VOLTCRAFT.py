@@ -28,6 +28,7 @@ PPS_MODELS = { (36.2,  7.0) : "PPS11360", # confirmed
 		     }
 
 PPS_TIMEOUT = 2.0
+PPS_MAX_ATTEMPTS = 10
 
 def _pps_debug(s):
 	sys.stdout.write(s)
@@ -159,7 +160,7 @@ class VOLTCRAFT(object):
 		# release the lock:
 		self._SERIAL_locked = False
 
-	def _query(self, cmd, attempt = 1, have_lock = False):
+	def _query(self, cmd, have_lock = False):
 		"""
 		tx/rx to/from PS
 		"""
@@ -167,54 +168,60 @@ class VOLTCRAFT(object):
 		if not have_lock:
 			self.get_SERIAL_lock()
 
-		if attempt > 10:
-			raise RuntimeError('Voltcraft PSU does not respond to ' + cmd + ' command after 10 attempts. Giving up...')
-		elif attempt > 1:
-			if self._debug:
-				_pps_debug('*** Retrying (attempt ' + str(attempt) + ')...')
+		try:
+			for attempt in range(1, PPS_MAX_ATTEMPTS+1):
 
-		if self._debug: _pps_debug("PPS <- %s<CR>\n" % cmd)
-		self._Serial.write((cmd + '\r').encode())
+				if attempt > 1:
+					if self._debug:
+						_pps_debug('*** Retrying (attempt ' + str(attempt) + ')...\n')
 
-		b = []
-		retry = False
-		if self._debug: _pps_debug("PPS -> ")
+				if self._debug: _pps_debug("PPS <- %s<CR>\n" % cmd)
+				self._Serial.write((cmd + '\r').encode())
 
-		# read answer byte by byte:
-		answerOK = False
-		while True:
-			
-			b.append(self._Serial.read(1).decode('utf-8'))
-			if self._debug: _pps_debug(b[-1].replace('\r', '<CR>'))
+				# read answer: pull all bytes available at the serial port at once, until the answer is terminated by OK<CR>:
+				b = self._read_answer()
+				if self._debug: _pps_debug("PPS -> %s\n" % repr(b))
 
-			# if there was no answer:
-			if b[-1] == "":
-				if self._debug:
-					_pps_debug('*** No response from Voltcraft PSU! Command: ' + cmd)
-				break
+				if b is not None:
+					return b
 
-			# if last three entries are OK\r, the answer is complete:
-			if b[-3:] == list("OK\r"):
-				answerOK = True
-				break
+				# no answer, or answer was incomplete / corrupted:
+				if self._debug:
+					_pps_debug('*** No valid response from Voltcraft PSU! Command: ' + cmd + '\n')
+				time.sleep(0.05) # give the PSU a moment to finish sending whatever it was sending
+				self._Serial.reset_input_buffer()
 
-		if self._debug: _pps_debug('\n')
+			raise RuntimeError('Voltcraft PSU does not respond to ' + cmd + ' command after ' + str(PPS_MAX_ATTEMPTS) + ' attempts. Giving up...')
 
-		if not answerOK:
-			self._Serial.flushOutput()			
-			time.sleep(0.2)
-			self._Serial.flushInput()
-			time.sleep(0.2)			
-			b = self._query(cmd,attempt+1, have_lock=True)
+		finally:
+			if not have_lock:
+				self.release_SERIAL_lock()
 
-		else:
-			b = "".join(b[:-4])
 
+	def _read_answer(self):
+		"""
+		read answer from PS (buffered), return answer string without the OK<CR> terminator (or None if there was no valid answer)
+		"""
 
-		if not have_lock:
-			self.release_SERIAL_lock()
+		buf = b''
+		deadline = time.time() + PPS_TIMEOUT
+		while True:
+			# wait for the next byte (or timeout), then take all bytes that are available:
+			u = self._Serial.read(max(1, self._Serial.in_waiting))
+			if len(u) == 0:
+				return None # no answer (timeout)
+			buf += u
+			k = buf.find(b'OK\r')
+			if k >= 0:
+				break
+			if time.time() > deadline:
+				return None # answer takes too long, something is wrong
 
-		return b
+		try:
+			# answer data is terminated by <CR> before OK<CR>:
+			return buf[:k].decode('ascii').rstrip('\r')
+		except UnicodeDecodeError:
+			return None # corrupted answer
 
 
 	def limits(self):
@@ -254,7 +261,14 @@ class VOLTCRAFT(object):
 		"""
 		read applied output voltage and current and if PS is in "CV" or "CC" mode
 		"""
-		s = self._query("GETD")
+		for k in range(PPS_MAX_ATTEMPTS):
+			s = self._query("GETD")
+			if len(s) == 9 and s.isdigit():
+				break
+			# invalid answer (garbled?), try again
+			if self._debug: _pps_debug('*** Invalid answer to GETD command: ' + repr(s) + '\n')
+		else:
+			raise RuntimeError('Could not read valid values from Voltcraft PSU!')
 		V = int(s[0:4]) / 100.
 		I = int(s[4:8]) / 100.
 		MODE = bool(int(s[8]))
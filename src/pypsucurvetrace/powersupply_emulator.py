@@ -0,0 +1,486 @@
+"""
+Python classes to emulate the serial interfaces of the supported power supplies on pseudo terminals
+(useful for testing and benchmarking of the unchanged PSU driver classes without hardware)
+"""
+
+# Each emulator opens a pseudo terminal (pty) and speaks the wire protocol of the emulated PSU type on the pty.
+# The port name of the pty is available as emulator.port, and can be used with the corresponding PSU driver
+# class (e.g., powersupply_KORAD.KORAD(emulator.port)) or in the COMPORT field of the curvetrace configuration.
+#
+# The PSU output is simulated with a DUT object from the powersupply_SIMULATED module (default: 100 Ohm resistor).
+#
+# Communication problems can be injected to test the error handling of the driver classes:
+#    latency: time required to process each command (s)
+#    drop:    probability of not sending a reply (0...1)
+#    garble:  probability of corrupting one byte of a reply (0...1)
+#
+# Example:
+#    import pypsucurvetrace.powersupply_emulator as powersupply_emulator
+#    import pypsucurvetrace.powersupply_KORAD as powersupply_KORAD
+#    E = powersupply_emulator.KORAD_emulator(latency=0.005, drop=0.01)
+#    P = powersupply_KORAD.KORAD(E.port)
+#    print(P.reading())
+#    E.close()
+
+import os
+import re
+import random
+import select
+import struct
+import threading
+import time
+import tty
+from pypsucurvetrace.curvetrace_tools import get_logger
+from pypsucurvetrace.powersupply_SIMULATED import simulated_DUT
+
+# set up logger:
+logger = get_logger('powersupply_emulator')
+
+
+class emulator(object):
+	"""
+	Abstract class for PSU emulators on a pseudo terminal (pty)
+	"""
+
+	def __init__(self, dut=None, terminal=1, latency=0.0, drop=0.0, garble=0.0, seed=None):
+		'''
+		emulator(dut, terminal, latency, drop, garble, seed)
+		dut: simulated DUT (powersupply_SIMULATED.simulated_DUT object, default: 100 Ohm resistor)
+		terminal: DUT terminal connected to the emulated PSU (1 or 2)
+		latency: time required to process each command (s)
+		drop: probability of not sending a reply (0...1)
+		garble: probability of corrupting one byte of a reply (0...1)
+		seed: seed for the random number generator used for drop and garble events (int)
+		'''
+
+		if dut is None:
+			dut = simulated_DUT('RESISTOR')
+		self._DUT = dut
+		self._terminal = terminal
+		self._DUT.connect(self._terminal, 0.01)
+
+		self.latency = latency
+		self.drop = drop
+		self.garble = garble
+		self._random = random.Random(seed)
+
+		# counters of commands and injected errors:
+		self.stats = { 'commands': 0, 'replies': 0, 'dropped': 0, 'garbled': 0 }
+
+		# open pty:
+		self._master, self._slave = os.openpty()
+		tty.setraw(self._slave)
+		self.port = os.ttyname(self._slave)
+
+		self._buffer = b''
+		self._do_run = True
+		self._thread = threading.Thread(target=self._run, daemon=True)
+		self._thread.start()
+
+
+	def close(self):
+		"""
+		stop the emulator and close the pty
+		"""
+		self._do_run = False
+		self._thread.join()
+		os.close(self._master)
+		os.close(self._slave)
+
+
+	def _run(self):
+		# emulator loop: read commands from the pty, process them, and send the replies
+		while self._do_run:
+			r, _, _ = select.select([self._master], [], [], 0.05)
+			if not r:
+				continue
+			try:
+				self._buffer += os.read(self._master, 1024)
+			except OSError:
+				break
+			while True:
+				frame = self._next_frame()
+				if frame is None:
+					break
+				self.stats['commands'] += 1
+				if self.latency > 0.0:
+					time.sleep(self.latency)
+				try:
+					reply = self._process(frame)
+				except Exception as e:
+					logger.debug('Could not process command ' + repr(frame) + ': ' + repr(e))
+					reply = None
+				if reply:
+					self._send(reply)
+
+
+	def _send(self, reply):
+		# send reply to pty (or drop or garble it):
+		if self._random.random() < self.drop:
+			self.stats['dropped'] += 1
+			return
+		if self._random.random() < self.garble:
+			reply = bytearray(reply)
+			k = self._random.randrange(len(reply))
+			reply[k] = (reply[k] + self._random.randrange(1, 256)) % 256
+			reply = bytes(reply)
+			self.stats['garbled'] += 1
+		self.stats['replies'] += 1
+		os.write(self._master, reply)
+
+
+	def _next_frame(self):
+		# remove the next complete command frame from the input buffer (return None if there is no complete frame)
+		raise NotImplementedError
+
+
+	def _process(self, frame):
+		# process command frame, return reply (bytes) or None
+		raise NotImplementedError
+
+
+	def _set(self, on=None, voltage=None, current=None):
+		self._DUT.set_output(self._terminal, on=on, voltage=voltage, current=current)
+
+
+	def _get(self):
+		return self._DUT.get_output(self._terminal)
+
+
+
+class _line_emulator(emulator):
+	"""
+	Abstract class for PSU emulators with line-based (text) protocols
+	"""
+
+	_EOL = b'\n'
+
+	def _next_frame(self):
+		k = self._buffer.find(self._EOL)
+		if k < 0:
+			return None
+		frame = self._buffer[:k]
+		self._buffer = self._buffer[k+len(self._EOL):]
+		return frame.decode('utf-8', errors='replace').strip()
+
+
+
+class KORAD_emulator(_line_emulator):
+	"""
+	Emulator for KORAD (RND) power supplies
+	"""
+
+	def __init__(self, model='KA3005P', terminator='\n', **kwargs):
+		'''
+		KORAD_emulator(model, terminator, ...)
+		model: KORAD model string (e.g., 'KA3005P' or 'KWR103')
+		terminator: string appended to the replies (note that some KORAD units send their replies without terminator)
+		further arguments: see emulator class
+		'''
+		self._model = model
+		self._terminator = terminator
+		emulator.__init__(self, **kwargs)
+
+
+	def _reply(self, s):
+		return (s + self._terminator).encode()
+
+
+	def _process(self, cmd):
+		cmd = cmd.upper()
+		if cmd == '*IDN?':
+			return self._reply('KORAD ' + self._model + ' V5.8 SN:00000001')
+
+		m = re.match(r'^VSET1?:(.*)$', cmd)
+		if m:
+			self._set(voltage=float(m.group(1)))
+			return None
+		m = re.match(r'^ISET1?:(.*)$', cmd)
+		if m:
+			self._set(current=float(m.group(1)))
+			return None
+		m = re.match(r'^OUT:?([01])$', cmd)
+		if m:
+			self._set(on=m.group(1) == '1')
+			return None
+
+		U, I, CC = self._get()
+		if re.match(r'^VOUT1?\?$', cmd):
+			return self._reply('{:05.2f}'.format(U))
+		if re.match(r'^IOUT1?\?$', cmd):
+			return self._reply('{:05.3f}'.format(I))
+		if cmd == 'STATUS?':
+			# bit 0: CV mode (1) or CC mode (0)
+			return self._reply( 'P' if CC else 'Q' )
+
+		raise ValueError('Unknown KORAD command')
+
+
+
+def _scpi_match(header, pattern):
+	# check if SCPI command header (e.g. 'MEAS:VOLT?') matches pattern with short-form letters in upper case (e.g. 'MEASure:VOLTage?')
+	header = header.upper().lstrip(':')
+	query = pattern.endswith('?')
+	if header.endswith('?') != query:
+		return False
+	h = header.rstrip('?').split(':')
+	p = pattern.rstrip('?').split(':')
+	if len(h) != len(p):
+		return False
+	for hh, pp in zip(h, p):
+		short = ''.join(c for c in pp if not c.islower())
+		if not hh in (short, pp.upper()):
+			return False
+	return True
+
+
+
+class _SCPI_emulator(_line_emulator):
+	"""
+	Abstract class for PSU emulators with SCPI protocol
+	"""
+
+	_IDN = ''
+	_compound = True
+
+	def _process(self, cmd):
+		# process (compound) SCPI command line, join the answers to queries by ';':
+		if ( ';' in cmd ) and not self._compound:
+			raise ValueError('Compound commands not supported')
+		answers = []
+		for c in cmd.split(';'):
+			c = c.strip()
+			if c == '':
+				continue
+			u = c.split(None, 1)
+			header = u[0].lstrip(':')
+			arg = u[1].strip() if len(u) > 1 else None
+			a = self._scpi(header, arg)
+			if a is not None:
+				answers.append(a)
+		if len(answers) == 0:
+			return None
+		return (';'.join(answers) + '\n').encode()
+
+
+	def _scpi(self, header, arg):
+		# process single SCPI command, return answer string (or None)
+		if _scpi_match(header, '*IDN?'):
+			return self._IDN
+		if _scpi_match(header, '*CLS') or _scpi_match(header, '*RST'):
+			return None
+		raise ValueError('Unknown SCPI command ' + header)
+
+
+
+class SALUKI_emulator(_SCPI_emulator):
+	"""
+	Emulator for SALUKI / MAYNUO power supplies
+	"""
+
+	def __init__(self, model='SPS831', compound=True, **kwargs):
+		'''
+		SALUKI_emulator(model, compound, ...)
+		model: SALUKI model string (e.g., 'SPS831')
+		compound: support compound SCPI commands (several commands separated by ';' in one line)
+		further arguments: see emulator class
+		'''
+		self._IDN = 'SALUKI,' + model + ',00000001,1.0'
+		self._compound = bool(compound)
+		emulator.__init__(self, **kwargs)
+
+
+	def _scpi(self, header, arg):
+		if _scpi_match(header, 'VOLTage'):
+			self._set(voltage=float(arg))
+			return None
+		if _scpi_match(header, 'CURRent'):
+			self._set(current=float(arg))
+			return None
+		if _scpi_match(header, 'OUTPut'):
+			self._set(on=arg.upper() in ('1', 'ON'))
+			return None
+		if _scpi_match(header, 'MEASure:VOLTage?'):
+			return '{:.4f}'.format(self._get()[0])
+		if _scpi_match(header, 'MEASure:CURRent?'):
+			return '{:.5f}'.format(self._get()[1])
+		return _SCPI_emulator._scpi(self, header, arg)
+
+
+
+class BK_emulator(_SCPI_emulator):
+	"""
+	Emulator for B&K power supplies
+	"""
+
+	def __init__(self, model='9185B', compound=True, **kwargs):
+		'''
+		BK_emulator(model, compound, ...)
+		model: B&K model string (e.g., '9185B' or '9120A')
+		compound: support compound SCPI commands (several commands separated by ';' in one line)
+		further arguments: see emulator class
+		'''
+		self._IDN = 'B&K Precision,' + model + ',00000001,1.0,0'
+		self._compound = bool(compound)
+		emulator.__init__(self, **kwargs)
+
+
+	def _scpi(self, header, arg):
+		if _scpi_match(header, 'SOURce:VOLTage'):
+			self._set(voltage=float(arg))
+			return None
+		if _scpi_match(header, 'SOURce:CURRent'):
+			self._set(current=float(arg))
+			return None
+		if _scpi_match(header, 'SOURce:VOLTage:RANGe'):
+			return None
+		if _scpi_match(header, 'OUTPut'):
+			self._set(on=arg.upper() in ('1', 'ON'))
+			return None
+		if _scpi_match(header, 'OUTPut:STATe?'):
+			return 'CC' if self._get()[2] else 'CV'
+		if _scpi_match(header, 'MEASure:VOLTage?'):
+			return '{:.4f}'.format(self._get()[0])
+		if _scpi_match(header, 'MEASure:CURRent?'):
+			return '{:.5f}'.format(self._get()[1])
+		return _SCPI_emulator._scpi(self, header, arg)
+
+
+
+class VOLTCRAFT_emulator(_line_emulator):
+	"""
+	Emulator for VOLTCRAFT PPS power supplies
+	"""
+
+	_EOL = b'\r'
+
+	def __init__(self, gmax='362700', **kwargs):
+		'''
+		VOLTCRAFT_emulator(gmax, ...)
+		gmax: answer to GMAX command (max. voltage and current, e.g. '362700' for the PPS11360)
+		further arguments: see emulator class
+		'''
+		self._gmax = gmax
+		self._imult = 100.0 if gmax == '362700' else 10.0
+		emulator.__init__(self, **kwargs)
+
+
+	def _process(self, cmd):
+		cmd = cmd.upper()
+		if cmd == 'GMAX':
+			return (self._gmax + '\rOK\r').encode()
+		if cmd.startswith('SOUT'):
+			self._set(on=int(cmd[4:]) == 0)
+		elif cmd.startswith('VOLT'):
+			self._set(voltage=int(cmd[4:]) / 10.0)
+		elif cmd.startswith('CURR'):
+			self._set(current=int(cmd[4:]) / self._imult)
+		elif cmd == 'GETD':
+			U, I, CC = self._get()
+			return ('{:04d}{:04d}{:1d}\rOK\r'.format(int(round(U*100)), int(round(I*100)), int(CC))).encode()
+		else:
+			raise ValueError('Unknown VOLTCRAFT command')
+		return b'OK\r'
+
+
+
+def _modbus_crc(data):
+	# CRC-16 (Modbus)
+	crc = 0xFFFF
+	for b in data:
+		crc ^= b
+		for i in range(8):
+			if crc & 1:
+				crc = (crc >> 1) ^ 0xA001
+			else:
+				crc >>= 1
+	return struct.pack('<H', crc)
+
+
+
+class RIDEN_emulator(emulator):
+	"""
+	Emulator for RIDEN (RUIDEN) RDxxxx power supplies (Modbus RTU)
+	"""
+
+	def __init__(self, model_id=60065, vres=0.001, ires=0.0001, slaveaddress=1, **kwargs):
+		'''
+		RIDEN_emulator(model_id, vres, ires, slaveaddress, ...)
+		model_id: value of the model register (e.g., 60065 for the RD6006P, 60125 for the RD6012P)
+		vres: voltage resolution of registers 8 and 10 (V)
+		ires: current resolution of registers 9 and 11 (A)
+		slaveaddress: Modbus slave address
+		further arguments: see emulator class
+		'''
+		self._vmult = 1.0 / vres
+		self._imult = 1.0 / ires
+		self._address = slaveaddress
+		self._registers = { 0: model_id }
+		emulator.__init__(self, **kwargs)
+
+
+	def _next_frame(self):
+		# Modbus RTU frames: determine frame length from function code
+		if len(self._buffer) < 2:
+			return None
+		fc = self._buffer[1]
+		if fc in (3, 6):
+			n = 8
+		elif fc == 16:
+			if len(self._buffer) < 7:
+				return None
+			n = 9 + self._buffer[6]
+		else:
+			# unknown function code, discard the buffer:
+			self._buffer = b''
+			return None
+		if len(self._buffer) < n:
+			return None
+		frame = self._buffer[:n]
+		self._buffer = self._buffer[n:]
+		return frame
+
+
+	def _read_register(self, r):
+		U, I, CC = self._get()
+		if r == 10:
+			return int(round(U*self._vmult))
+		if r == 11:
+			return int(round(I*self._imult))
+		if r == 12: # power (high word)
+			return (int(round(U*I*100)) >> 16) & 0xFFFF
+		if r == 13: # power (low word)
+			return int(round(U*I*100)) & 0xFFFF
+		if r == 17:
+			return int(CC)
+		return self._registers.get(r, 0)
+
+
+	def _write_register(self, r, value):
+		self._registers[r] = value
+		if r == 8:
+			self._set(voltage=value/self._vmult)
+		elif r == 9:
+			self._set(current=value/self._imult)
+		elif r == 18:
+			self._set(on=bool(value))
+
+
+	def _process(self, frame):
+		if _modbus_crc(frame[:-2]) != frame[-2:]:
+			raise ValueError('Modbus CRC error')
+		if frame[0] != self._address:
+			return None
+		fc = frame[1]
+		r, n = struct.unpack('>HH', frame[2:6])
+		if fc == 3:
+			data = b''.join( struct.pack('>H', self._read_register(r+k)) for k in range(n) )
+			reply = bytes([self._address, 3, len(data)]) + data
+		elif fc == 6:
+			self._write_register(r, n)
+			reply = frame[:6]
+		elif fc == 16:
+			for k in range(n):
+				self._write_register(r+k, struct.unpack('>H', frame[7+2*k:9+2*k])[0])
+			reply = frame[:6]
+		return reply + _modbus_crc(reply)
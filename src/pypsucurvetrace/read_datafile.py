@@ -19,6 +19,7 @@ class preheat:
 	U2 = None
 	I2 = None
 	T  = None
+	t  = None # duration of pre-heat (s)
 
 
 class measurement_data:
@@ -165,6 +166,10 @@ def read_datafile(datafile):
 				ph.T = float(u[5].split('°C')[0])
 			except:
 				ph.T = None
+			try:
+				ph.t = float(u[6].split('s')[0])
+			except:
+				ph.t = None
 			break # break from the loop
 		
 	r2 = None
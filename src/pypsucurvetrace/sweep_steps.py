@@ -0,0 +1,343 @@
+"""
+Python class for the voltage steps of curve tracing sweeps (fixed or adaptive step size)
+"""
+
+import math
+import numpy as np
+from pypsucurvetrace.curvetrace_tools import get_logger
+
+# set up logger:
+logger = get_logger('sweep_steps')
+
+
+# voltage_steps:
+#    iter(steps)           start new sweep, yields the voltage values of the sweep
+#    .add(V, y)            add DUT response y (number or array) observed at voltage V (used for adaptive step size)
+#    .is_adaptive()        True if step size is adaptive
+#    .num_steps()          number of steps (fixed step size) or max. number of steps (adaptive step size)
+#    .state()              state of the current sweep (for checkpoints of interrupted curve tracing)
+#    .resume(state, V)     continue a sweep from a state / the voltage step V returned by .state() / the sweep
+
+class voltage_steps:
+	"""
+	Voltage steps of a curve tracing sweep.
+
+	With fixed step size, the sweep runs from start to end at the given step size.
+
+	With adaptive step size, the sweep starts at the (fine) step size and then adapts the step size to the DUT response:
+	after each step, the observed DUT response is compared with the linear extrapolation of the two previous responses.
+	The step size is increased (up to step_max) where the response is linear, and decreased (down to step) where the slope
+	of the response changes quickly (for example at the knee of a curve or at the onset of saturation).
+	"""
+
+	def __init__(self, start, end, step, step_max=None, tol=None, resolution=None):
+		'''
+		voltage_steps(start, end, step, step_max=None, tol=None, resolution=None)
+		start: start voltage (V)
+		end: end voltage (V)
+		step: (min.) step size (V), use step = 0 for a fixed voltage
+		step_max (optional): max. step size for adaptive step size (V), no adaptive step size if step_max is None or step_max <= step
+		tol (optional): max. deviation of the DUT response from the linear extrapolation (same unit as the response)
+		resolution (optional): voltage setting resolution of the PSU (V)
+		'''
+
+		self._start = start
+		self._end = end
+		self._step = abs(step)
+		self._step_max = step_max
+		self._tol = tol
+		self._resolution = resolution
+
+		self._adaptive = True
+		if self._step == 0.0:
+			self._adaptive = False
+		elif ( self._step_max is None ) or ( self._step_max <= self._step ):
+			self._adaptive = False
+		elif ( self._tol is None ) or ( self._tol <= 0.0 ):
+			self._adaptive = False
+
+		if self._end >= self._start:
+			self._dir = 1
+		else:
+			self._dir = -1
+
+		# fixed steps:
+		if self._step == 0.0:
+			self._grid = [ self._start ]
+		else:
+			if self._dir > 0:
+				u = np.arange( self._start , self._end + self._step ,  self._step )
+				u = [i for i in u if (i >= self._start) and (i <= self._end) ] # filter out "outliers" that may happen with large VSTEPs
+			else:
+				u = np.arange( self._start , self._end - self._step , -self._step )
+				u = [i for i in u if (i >= self._end) and (i <= self._start) ] # filter out "outliers" that may happen with large VSTEPs
+			self._grid = u
+
+		# DUT response data of the current sweep:
+		self._V = []
+		self._y = []
+		self._h = self._step
+
+
+	def __iter__(self):
+		# start a new sweep:
+		self._V = []
+		self._y = []
+		self._h = self._step
+		if self._adaptive:
+			return self._adaptive_steps(self._start, repeat=True)
+		else:
+			return iter(self._grid)
+
+
+	def state(self):
+		'''
+		s = voltage_steps.state()
+
+		State of the current sweep (DUT response data used for the adaptive step size), e.g. to write a checkpoint of an interrupted curve tracing run.
+
+		INPUT:
+		(none)
+
+		OUTPUT:
+		s: dictionary with the state data (JSON compatible)
+		'''
+		return { 'V': [ float(V) for V in self._V[-3:] ] , 'y': [ y.tolist() for y in self._y[-3:] ] , 'h': float(self._h) }
+
+
+	def resume(self, state, V, repeat=False):
+		'''
+		steps = voltage_steps.resume(state, V, repeat=False)
+
+		Continue a sweep that was interrupted after voltage step V.
+
+		INPUT:
+		state: state of the sweep as returned by voltage_steps.state() after voltage step V
+		V: voltage of the last step completed before the interruption (V)
+		repeat (optional): if True, the sweep continues with voltage step V, otherwise with the step after V
+
+		OUTPUT:
+		steps: iterator of the remaining voltage values of the sweep
+		'''
+		self._V = list(state['V'])
+		self._y = [ np.asarray(y, dtype=float) for y in state['y'] ]
+		self._h = state['h']
+		if self._adaptive:
+			return self._adaptive_steps(V, repeat=repeat)
+		else:
+			k = int(np.argmin(np.abs(np.asarray(self._grid) - V)))
+			if not repeat:
+				k = k + 1
+			return iter(self._grid[k:])
+
+
+	def is_adaptive(self):
+		return self._adaptive
+
+
+	def num_steps(self):
+		return len(self._grid)
+
+
+	def add(self, V, y):
+		'''
+		voltage_steps.add(V, y)
+
+		Add DUT response y observed at voltage V during the current sweep.
+
+		INPUT:
+		V: voltage (V)
+		y: DUT response (number, or array of numbers with the same length for all voltage steps)
+
+		OUTPUT:
+		(none)
+		'''
+		y = np.atleast_1d(np.asarray(y, dtype=float))
+		if np.all(np.isfinite(y)):
+			self._V.append(V)
+			self._y.append(y)
+
+
+	def _round(self, V):
+		# round voltage value to setting resolution of the PSU:
+		if self._resolution:
+			V = round(V/self._resolution) * self._resolution
+		return V
+
+
+	def _next_step_size(self, h):
+		# determine step size for the next step from the DUT response of the last steps:
+		if len(self._V) < 3:
+			return self._step
+
+		V = self._V[-3:]
+		y = self._y[-3:]
+		if ( V[1] == V[0] ) or ( V[2] == V[1] ):
+			return h
+
+		# deviation of last response from linear extrapolation of the two previous responses:
+		y_pred = y[1] + (y[1]-y[0]) * (V[2]-V[1])/(V[1]-V[0])
+		err = np.max(np.abs(y[2]-y_pred))
+
+		h_last = abs(V[2]-V[1])
+		if err == 0.0:
+			f = 2.0
+		else:
+			f = min( 2.0 , max( 0.25 , 0.9*math.sqrt(self._tol/err) ) )
+		h = round(f*h_last/self._step) * self._step
+
+		return min( max(h, self._step) , self._step_max )
+
+
+	def _adaptive_steps(self, V, repeat=True):
+		# generator of adaptive voltage steps, starting at V (repeat = True) or at the step after V (repeat = False):
+		while True:
+			if repeat:
+				yield V
+			repeat = True
+			if self._dir*(self._end-V) <= self._step/1000:
+				break # end of sweep
+			self._h = self._next_step_size(self._h)
+			V_next = V + self._dir*self._h
+			if self._dir*(V_next-self._end) > 0:
+				V_next = self._end
+			V = self._round(V_next)
+
+
+
+def resample_curve(V, I, V_ref):
+	'''
+	I_ref = resample_curve(V, I, V_ref)
+
+	Interpolate curve data (V, I) at the voltages V_ref (values outside the voltage range of the curve data are set to the first / last I value).
+	Useful to compare curves measured at different voltage steps.
+
+	INPUT:
+	V: voltage values of the curve data
+	I: current values of the curve data
+	V_ref: voltage values to be used for interpolation
+
+	OUTPUT:
+	I_ref: current values at V_ref
+	'''
+
+	if len(V) == 0:
+		return np.zeros(len(V_ref))
+	V = np.asarray(V, dtype=float)
+	I = np.asarray(I, dtype=float)
+	k = np.argsort(V)
+	return np.interp(V_ref, V[k], I[k])
+
+
+def predict_current(V, curve_V, curve_I, prev_V=None, prev_I=None):
+	'''
+	I_pred = predict_current(V, curve_V, curve_I, prev_V=None, prev_I=None)
+
+	Predict the current at voltage V of a curve in progress, from the data measured so far on the curve and from the data of the previous curve (if any).
+	The current is predicted by linear extrapolation of the last two points of the curve, and by the current of the previous curve at V, shifted by the
+	difference of the two curves at the last point of the curve. The lower of the predictions is returned, so that the prediction errs on the side of low current values.
+
+	INPUT:
+	V: voltage (V)
+	curve_V: voltage values measured so far on the curve
+	curve_I: current values measured so far on the curve
+	prev_V (optional): voltage values of the previous curve
+	prev_I (optional): current values of the previous curve
+
+	OUTPUT:
+	I_pred: predicted current at V (None if there are not enough data for a prediction)
+	'''
+
+	pred = []
+
+	# linear extrapolation of the last two points of the curve:
+	if len(curve_V) >= 2:
+		V0, V1 = curve_V[-2:]
+		I0, I1 = curve_I[-2:]
+		if V1 != V0:
+			pred.append( I1 + (I1-I0) * (V-V1)/(V1-V0) )
+
+	# previous curve, shifted to the last point of the curve (only within the voltage range of the previous curve):
+	if ( prev_V is not None ) and ( len(prev_V) > 0 ) and ( len(curve_V) > 0 ):
+		if min(prev_V) <= V <= max(prev_V):
+			dI = curve_I[-1] - resample_curve(prev_V, prev_I, [curve_V[-1]])[0]
+			pred.append( resample_curve(prev_V, prev_I, [V])[0] + dI )
+
+	if len(pred) == 0:
+		return None
+	return float(min(pred))
+
+
+
+def plan_sweep(V1, V2, settle1=None, settle2=None, outer='AUTO', serpentine=False):
+	'''
+	points, outer, serpentine = plan_sweep(V1, V2, settle1=None, settle2=None, outer='AUTO', serpentine=False)
+
+	Plan the order of the (V2, V1) points of a curve tracing run with fixed voltage steps. The PSU in the inner loop changes its voltage at every point,
+	so the PSU with the longer settle time should be in the outer loop. With serpentine traversal, the inner loop runs in alternating directions
+	(no large voltage steps back to the start of the inner loop). With PSU2 in the outer loop, serpentine traversal traces every other curve in
+	reverse direction. These curves start in the current / power limit and cannot be cut off at the limit, which costs more time than the voltage
+	steps saved. Serpentine traversal with PSU2 in the outer loop is therefore only used if serpentine = True.
+
+	INPUT:
+	V1: voltage steps of PSU1 (list)
+	V2: voltage steps of PSU2 (list)
+	settle1, settle2 (optional): functions returning the settle time of PSU1 / PSU2 after a voltage step dV (s), or None if the settle time is not known
+	outer (optional): PSU in the outer loop: 'PSU2' (standard order, one curve after the other), 'PSU1', or 'AUTO' (order with the lowest total settle time)
+	serpentine (optional): True, False, or 'AUTO' (use serpentine traversal if it reduces the total settle time, only with PSU1 in the outer loop)
+
+	OUTPUT:
+	points: list of index pairs (i2, i1) in the order of the measurements
+	outer: PSU in the outer loop ('PSU1' or 'PSU2')
+	serpentine: serpentine traversal (bool)
+	'''
+
+	def order(o, s):
+		# index pairs for outer loop o and serpentine flag s:
+		if o == 'PSU2':
+			n_outer, n_inner = len(V2), len(V1)
+		else:
+			n_outer, n_inner = len(V1), len(V2)
+		p = []
+		for i in range(n_outer):
+			inner = range(n_inner)
+			if s and ( i % 2 == 1 ):
+				inner = reversed(inner)
+			for j in inner:
+				if o == 'PSU2':
+					p.append( (i, j) )
+				else:
+					p.append( (j, i) )
+		return p
+
+	def cost(p):
+		# total settle time of the voltage steps between the points:
+		t = 0.0
+		for k in range(1, len(p)):
+			for V, f, i in [ (V2, settle2, 0) , (V1, settle1, 1) ]:
+				dV = abs( V[p[k][i]] - V[p[k-1][i]] )
+				if dV > 0.0:
+					t += f(dV)
+		return t
+
+	# candidate orders:
+	candidates = []
+	for o in ['PSU2', 'PSU1']:
+		if outer in [o, 'AUTO']:
+			for s in [False, True]:
+				if ( serpentine == s ) or ( ( serpentine == 'AUTO' ) and not ( s and ( o == 'PSU2' ) ) ):
+					candidates.append( (o, s) )
+
+	# determine total settle time of the candidates (if the settle times are known):
+	if len(candidates) > 1:
+		known = ( settle1 is not None ) and ( settle2 is not None ) and ( settle1(1.0) is not None ) and ( settle2(1.0) is not None )
+		if known:
+			t = [ cost(order(o, s)) for o, s in candidates ]
+			# use the first candidate (closest to the standard order) unless another candidate saves at least 10% of the settle time:
+			k = int(np.argmin(t))
+			if t[k] > 0.9*t[0]:
+				k = 0
+			candidates = [ candidates[k] ]
+
+	o, s = candidates[0]
+	return order(o, s), o, s
@@ -22,6 +22,7 @@
 try:
 	import sys
 	import time
+	import threading
 	from digitemp.master import UART_Adapter
 	from digitemp.device import AddressableDevice
 	from digitemp.device import DS18B20
@@ -83,7 +84,7 @@ class temperaturesensor_MAXIM:
 					self._sensor = DS18B20(bus, rom=romcode)
 					self._ROMcode = romcode
 				
-				self._UART_locked = False
+				self._UART_lock = threading.Lock()
 
 			if not hasattr(self,'_sensor'):
 				self.warning( 'Could not initialize MAXIM DS1820 temperature sensor.' )
@@ -109,12 +110,8 @@ class temperaturesensor_MAXIM:
 		(none)
 		'''
 
-		# wait until the serial port is unlocked:
-		while self._UART_locked == True:
-			time.sleep(0.01)
-			
-		# lock the port:
-		self._UART_locked = True
+		# wait until the serial port is unlocked, and lock it:
+		self._UART_lock.acquire()
 
 
 	########################################################################################################
@@ -134,10 +131,7 @@ class temperaturesensor_MAXIM:
 		'''
 
 		# release the lock:
-		self._UART_locked = False
-		
-		# sleep to allow access to T sensor from others
-		time.sleep(0.013)
+		self._UART_lock.release()
 
 
 	
@@ -160,14 +154,72 @@ class temperaturesensor_MAXIM:
 
 		temp = None;
 		unit = '?';
+		self.get_UART_lock()
 		try:
-			self.get_UART_lock()
 			temp = self._sensor.get_temperature()
-			self.release_UART_lock()
 			unit = 'deg.C'
 		except:
+			self.warning( 'could not read sensor!' )
+		finally:
+			self.release_UART_lock()
+
+		return temp,unit
+
+
+	########################################################################################################
+		
+
+	def start_conversion(self):
+		"""
+		t_conv = temperaturesensor_MAXIM.start_conversion()
+		
+		Start a temperature conversion without waiting for the result (the serial port is only locked while sending the command).
+		Use temperaturesensor_MAXIM.read_conversion() to read the result after the conversion time.
+		
+		INPUT:
+		(none)
+		
+		OUTPUT:
+		t_conv: conversion time (s), i.e. time to wait before reading the result
+		"""
+
+		self.get_UART_lock()
+		try:
+			self._sensor._reset()
+			self._sensor.bus.write_byte(0x44) # CONVERT T
+		finally:
 			self.release_UART_lock()
+
+		return self._sensor.t_conv
+
+
+	########################################################################################################
+		
+
+	def read_conversion(self):
+		"""
+		temp,unit = temperaturesensor_MAXIM.read_conversion()
+		
+		Read the result of the temperature conversion started by temperaturesensor_MAXIM.start_conversion().
+		
+		INPUT:
+		(none)
+		
+		OUTPUT:
+		temp: temperature value (float)
+		unit: unit of temperature value (string)
+		"""
+
+		temp = None;
+		unit = '?';
+		self.get_UART_lock()
+		try:
+			temp = self._sensor.read_temperature()
+			unit = 'deg.C'
+		except:
 			self.warning( 'could not read sensor!' )
+		finally:
+			self.release_UART_lock()
 
 		return temp,unit
 